@@ -0,0 +1,187 @@
+import hashlib
+
+from cache import cache
+from database import read_only
+from flask import Blueprint, Response, abort, current_app, request
+from models import Artist, Genre, Show, Venue, db
+from pagination import Page
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+  import json
+
+#----------------------------------------------------------------------------#
+# JSON API.
+#
+# Every row carries a version that is bumped on each update, so ETags are
+# computed from (id, version) pairs alone: a conditional GET only runs a
+# narrow query on the ids and versions, and returns 304 before the full
+# query and the serialization when nothing changed.
+#----------------------------------------------------------------------------#
+
+api = Blueprint('api', __name__)
+
+# Fields that can be selected with ?fields=, per model
+FIELDS = {
+  Venue: ('id', 'name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link',
+          'website', 'seeking_talent', 'seeking_description', 'genres',
+          'upcoming_shows_count', 'past_shows_count'),
+  Artist: ('id', 'name', 'city', 'state', 'phone', 'image_link', 'facebook_link',
+           'website', 'seeking_venue', 'seeking_description', 'genres',
+           'upcoming_shows_count', 'past_shows_count'),
+  Show: ('id', 'venue_id', 'artist_id', 'start_time'),
+}
+
+def dumps(data):
+  if orjson is not None:
+    return orjson.dumps(data)
+  return json.dumps(data, separators=(',', ':'), default=lambda value: value.isoformat()).encode()
+
+def json_response(data, status=200):
+  return Response(dumps(data), status=status, mimetype='application/json')
+
+@api.errorhandler(400)
+def bad_request(error):
+  return json_response({'error': error.description}, 400)
+
+@api.errorhandler(404)
+def not_found(error):
+  return json_response({'error': 'Not found'}, 404)
+
+def selected_fields(model):
+  fields = request.args.get('fields')
+  if not fields:
+    return FIELDS[model]
+  fields = tuple(dict.fromkeys(field.strip() for field in fields.split(',')))
+  unknown = set(fields) - set(FIELDS[model])
+  if unknown:
+    abort(400, 'Unknown fields: %s' % ', '.join(sorted(unknown)))
+  return fields
+
+def make_etag(model, versions, fields, next_cursor=None):
+  digest = hashlib.sha1(repr((sorted(fields), versions, next_cursor)).encode()).hexdigest()
+  return '%s-%s' % (model.__tablename__.lower(), digest)
+
+def not_modified(etag):
+  if etag in request.if_none_match:
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+  return None
+
+def get_page(model, columns, cursor, limit):
+  return Page(db.session.query(*columns), (model.id,), cursor=cursor, limit=limit)
+
+# Genre names of the given venues or artists, by id
+def get_genres(model, ids):
+  association = model.genres.property.secondary
+  key = association.c[model.__tablename__.lower() + '_id']
+  genres = {}
+  rows = db.session.query(key, Genre.name) \
+    .join(Genre, Genre.id == association.c.genre_id) \
+    .filter(key.in_(ids)) \
+    .order_by(key, Genre.name)
+  for id, name in rows:
+    genres.setdefault(id, []).append(name)
+  return genres
+
+def serialize(model, rows, fields):
+  columns = [field for field in fields if field != 'genres']
+  data = [{field: getattr(row, field) for field in columns} for row in rows]
+  if 'genres' in fields:
+    genres = get_genres(model, [row.id for row in rows])
+    for item, row in zip(data, rows):
+      item['genres'] = genres.get(row.id, [])
+  return data
+
+def list_resource(model):
+  fields = selected_fields(model)
+  cursor = request.args.get('after')
+  limit = request.args.get('limit', current_app.config['API_PAGE_SIZE'], type=int)
+  limit = max(1, min(limit, current_app.config['API_MAX_PAGE_SIZE']))
+  
+  versions = get_page(model, (model.id, model.version), cursor, limit)
+  etag = make_etag(model, [tuple(row) for row in versions], fields, versions.next_cursor)
+  response = not_modified(etag)
+  if response is not None:
+    return response
+  
+  columns = [getattr(model, field) for field in fields if field != 'genres']
+  page = get_page(model, dict.fromkeys([model.id] + columns), cursor, limit)
+  rows = list(page)
+  
+  response = json_response({'data': serialize(model, rows, fields), 'next': page.next_cursor})
+  response.set_etag(etag)
+  return response
+
+def get_resource(model, id):
+  fields = selected_fields(model)
+  
+  version = db.session.query(model.version).filter(model.id == id).scalar()
+  if version is None:
+    abort(404)
+  etag = make_etag(model, [(id, version)], fields)
+  response = not_modified(etag)
+  if response is not None:
+    return response
+  
+  columns = [getattr(model, field) for field in fields if field != 'genres']
+  row = db.session.query(*dict.fromkeys([model.id] + columns)).filter(model.id == id).one()
+  
+  response = json_response(serialize(model, [row], fields)[0])
+  response.set_etag(etag)
+  return response
+
+@api.route('/venues')
+@read_only
+def venues():
+  return list_resource(Venue)
+
+@api.route('/venues/<int:venue_id>')
+@read_only
+def venue(venue_id):
+  return get_resource(Venue, venue_id)
+
+@api.route('/artists')
+@read_only
+def artists():
+  return list_resource(Artist)
+
+@api.route('/artists/<int:artist_id>')
+@read_only
+def artist(artist_id):
+  return get_resource(Artist, artist_id)
+
+@api.route('/shows')
+@read_only
+def shows():
+  return list_resource(Show)
+
+@api.route('/shows/<int:show_id>')
+@read_only
+def show(show_id):
+  return get_resource(Show, show_id)
+
+# Schedule many shows at once. Takes a list of {venue_id, artist_id,
+# start_time} objects and returns a report per show: created, invalid, or in
+# conflict with the listed shows.
+@api.route('/shows/batch', methods=['POST'])
+def schedule():
+  from scheduling import schedule_shows
+  rows = request.get_json(silent=True)
+  if isinstance(rows, dict):
+    rows = rows.get('shows')
+  if not isinstance(rows, list):
+    abort(400, 'Expected a list of shows')
+  if len(rows) > current_app.config['SCHEDULE_MAX_SHOWS']:
+    abort(400, 'At most %d shows per request' % current_app.config['SCHEDULE_MAX_SHOWS'])
+  
+  report = schedule_shows(rows)
+  created = [entry for entry in report if entry['status'] == 'created']
+  if created:
+    cache.invalidate('venues', 'artists', 'shows',
+                     *{'venue:%d' % entry['venue_id'] for entry in created},
+                     *{'artist:%d' % entry['artist_id'] for entry in created})
+  return json_response({'created': len(created), 'results': report}, 201 if created else 200)
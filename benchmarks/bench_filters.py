@@ -0,0 +1,32 @@
+#----------------------------------------------------------------------------#
+# Micro-benchmarks: the datetime template filter, on a page of show tiles.
+#----------------------------------------------------------------------------#
+
+import random
+
+from datetime import datetime, timedelta
+
+from filters import format_datetime
+
+def show_times(rows=1000, distinct=200):
+  rng = random.Random(0)
+  start = datetime(2026, 1, 1, 20, 0)
+  times = [start + timedelta(days=rng.randint(0, 365), minutes=30 * rng.randint(0, 8)) for _ in range(distinct)]
+  return [rng.choice(times) for _ in range(rows)]
+
+def format_page(values):
+  for value in values:
+    format_datetime(value, 'full')
+
+def test_format_datetime_cold(benchmark):
+  values = show_times()
+  benchmark.pedantic(format_page, args=(values,), setup=format_datetime.cache_clear, rounds=20)
+
+def test_format_datetime_warm(benchmark):
+  values = show_times()
+  format_page(values)
+  benchmark(format_page, values)
+
+# A string value, formatted past the memoization
+def test_format_datetime_string(benchmark):
+  benchmark(format_datetime.__wrapped__, '2026-05-21 21:30:00', 'medium')
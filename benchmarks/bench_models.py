@@ -0,0 +1,77 @@
+#----------------------------------------------------------------------------#
+# Micro-benchmarks: the query helpers of models.py, on the generated data.
+#
+# The busiest venue and artist have the largest histories, which is where
+# the detail page helpers are slowest; typical ones have the median history.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+
+import pytest
+
+from models import (Artist, Show, Venue, db, filter_by_genre, refresh_show_counters,
+                    roll_show_counters, show_counts_select, shows_query, split_shows)
+
+TODAY = datetime.today()
+
+# Ids of the venues or artists with the most and the median number of shows
+def by_history(model):
+  key = getattr(Show, model.__tablename__.lower() + '_id')
+  ids = [id for id, in db.session.query(key).group_by(key).order_by(db.func.count().desc(), key)]
+  return {'busiest': ids[0], 'typical': ids[len(ids) // 2]}
+
+@pytest.fixture
+def venues(session):
+  return by_history(Venue)
+
+@pytest.fixture
+def artists(session):
+  return by_history(Artist)
+
+#  Listings
+#  ----------------------------------------------------------------
+
+def test_venue_areas(benchmark, session):
+  def areas():
+    venues = Venue.get_listing().order_by(Venue.city, Venue.state, Venue.name, Venue.id)
+    return [(area['city'], area['state'], list(area['venues'])) for area in Venue.get_areas(venues)]
+  benchmark(areas)
+
+def test_show_listing(benchmark, session):
+  benchmark(lambda: Show.get_listing().limit(100).all())
+
+def test_filter_by_genre(benchmark, session):
+  benchmark(lambda: filter_by_genre(Artist.query, Artist, 'Jazz').limit(100).all())
+
+#  Detail pages
+#  ----------------------------------------------------------------
+
+@pytest.mark.parametrize('history', ['busiest', 'typical'])
+def test_venue_shows(benchmark, session, venues, history):
+  venue = Venue.query.get(venues[history])
+  benchmark(venue.get_shows, TODAY, limit=10)
+
+@pytest.mark.parametrize('history', ['busiest', 'typical'])
+def test_artist_shows(benchmark, session, artists, history):
+  artist = Artist.query.get(artists[history])
+  benchmark(artist.get_shows, TODAY, limit=10)
+
+@pytest.mark.parametrize('upcoming', [True, False], ids=['upcoming', 'past'])
+def test_shows_query(benchmark, session, venues, upcoming):
+  benchmark(shows_query, Show.venue_id == venues['busiest'], Artist, TODAY, upcoming, limit=10)
+
+def test_split_shows_unlimited(benchmark, session, venues):
+  benchmark(split_shows, Show.venue_id == venues['typical'], Artist, TODAY)
+
+def test_show_counts(benchmark, session, venues):
+  statement = show_counts_select(Show.venue_id == venues['busiest'], TODAY)
+  benchmark(lambda: db.session.execute(statement).one())
+
+#  Writes
+#  ----------------------------------------------------------------
+
+def test_refresh_show_counters(benchmark, session):
+  benchmark(lambda: refresh_show_counters(db.session.connection(), Venue, date=TODAY))
+
+def test_roll_show_counters(benchmark, session):
+  benchmark(lambda: roll_show_counters(db.session.connection(), date=TODAY))
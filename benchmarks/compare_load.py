@@ -0,0 +1,52 @@
+#----------------------------------------------------------------------------#
+# Compare two load test results written by locustfile.py --results-json.
+#
+# Lists the p50/p95 latency of every route in both runs, and exits with
+# status 1 when a route's p95 is slower by more than --tolerance, or when
+# its failure rate went up. Routes with fewer than --min-requests requests
+# in either run are listed but not checked.
+#
+# Usage: python benchmarks/compare_load.py base.json new.json [--tolerance 0.2]
+#----------------------------------------------------------------------------#
+
+import argparse
+import json
+import sys
+
+def failure_rate(route):
+  return route['failures'] / route['requests'] if route['requests'] else 0
+
+def main():
+  parser = argparse.ArgumentParser(description='Compare two load test results.')
+  parser.add_argument('base')
+  parser.add_argument('new')
+  parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p95 slowdown, as a fraction.')
+  parser.add_argument('--min-requests', type=int, default=20)
+  args = parser.parse_args()
+
+  with open(args.base) as file:
+    base = json.load(file)
+  with open(args.new) as file:
+    new = json.load(file)
+
+  print('base: %s, new: %s' % (base.get('commit'), new.get('commit')))
+  print('%-40s %10s %10s %10s %10s  %s' % ('route', 'base p50', 'new p50', 'base p95', 'new p95', ''))
+  regressions = 0
+  for name in sorted(set(base['routes']) & set(new['routes'])):
+    before, after = base['routes'][name], new['routes'][name]
+    status = ''
+    if min(before['requests'], after['requests']) >= args.min_requests:
+      if after['p95_ms'] > before['p95_ms'] * (1 + args.tolerance):
+        status = 'SLOWER'
+      elif failure_rate(after) > failure_rate(before):
+        status = 'MORE FAILURES'
+    regressions += bool(status)
+    print('%-40s %10.0f %10.0f %10.0f %10.0f  %s' % (name, before['p50_ms'], after['p50_ms'],
+                                                     before['p95_ms'], after['p95_ms'], status))
+
+  if regressions:
+    print('%d route(s) regressed' % regressions)
+    sys.exit(1)
+
+if __name__ == '__main__':
+  main()
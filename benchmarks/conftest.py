@@ -0,0 +1,49 @@
+#----------------------------------------------------------------------------#
+# Fixtures of the micro-benchmarks.
+#
+# The database is filled once per session by datagen, on BENCHMARK_DATABASE_URL
+# (an in-memory SQLite database by default), with BENCHMARK_VENUES venues,
+# BENCHMARK_ARTISTS artists and BENCHMARK_SHOWS shows. Its tables are dropped
+# and recreated first, so never point it at a database you want to keep.
+#----------------------------------------------------------------------------#
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+SIZES = {'venues': int(os.environ.get('BENCHMARK_VENUES', 500)),
+         'artists': int(os.environ.get('BENCHMARK_ARTISTS', 1000)),
+         'shows': int(os.environ.get('BENCHMARK_SHOWS', 20000))}
+
+@pytest.fixture(scope='session')
+def app():
+  import config
+  config.SQLALCHEMY_DATABASE_URI = os.environ.get('BENCHMARK_DATABASE_URL', 'sqlite://')
+  from app import create_app
+  return create_app()
+
+@pytest.fixture(scope='session')
+def dataset(app):
+  from datagen import generate
+  from models import db
+  
+  with app.app_context():
+    db.drop_all()
+    db.create_all()
+    summary = generate(db, seed=0, **SIZES)
+  yield summary
+  with app.app_context():
+    db.drop_all()
+
+# An app context on the generated data, whose session is cleared after each benchmark
+@pytest.fixture
+def session(app, dataset):
+  from models import db
+  
+  with app.app_context():
+    yield db.session
+    db.session.rollback()
+    db.session.remove()
@@ -0,0 +1,183 @@
+#----------------------------------------------------------------------------#
+# Synthetic data for benchmarks and load tests.
+#
+# Generates venues, artists and shows from a seed, so that every run on the
+# same arguments gets the same rows. Shows are spread over the venues and
+# artists with a Zipf-like skew: with the default --skew 0.8, the busiest
+# venue has over a hundred times the history of the median one, like the few
+# big halls of a city next to its many small clubs.
+#
+# Usage: python benchmarks/datagen.py [--database-url URL] [--venues 1000]
+#          [--artists 2000] [--shows 100000] [--seed 0] [--skew 0.8]
+#----------------------------------------------------------------------------#
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import config
+
+WORDS = ['the', 'blue', 'velvet', 'midnight', 'jazz', 'quartet', 'electric', 'soul', 'brothers',
+         'sisters', 'band', 'orchestra', 'riot', 'echo', 'gold', 'river', 'silver', 'wolves',
+         'hop', 'dueling', 'pianos', 'live', 'music', 'park', 'square', 'crystal', 'machine']
+VENUE_WORDS = ['Hall', 'Club', 'Theatre', 'Lounge', 'Room', 'Garden', 'Arena', 'Cellar', 'Bar']
+CITIES = [('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'), ('Chicago', 'IL'),
+          ('Seattle', 'WA'), ('Nashville', 'TN'), ('New Orleans', 'LA'), ('Portland', 'OR'),
+          ('Denver', 'CO'), ('Atlanta', 'GA')]
+GENRES = ['Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk', 'Hip-Hop',
+          'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae',
+          'Rock n Roll', 'Soul', 'Other']
+
+BATCH_SIZE = 10000
+
+# Shows start at one of these hours, on a day between PAST_DAYS ago and
+# FUTURE_DAYS from now
+SHOW_HOURS = (18, 19, 20, 21, 22)
+PAST_DAYS = 3 * 365
+FUTURE_DAYS = 180
+
+# Cumulative Zipf weights of n items: the i-th item gets 1 / i^skew
+def zipf_weights(n, skew):
+  return list(accumulate(1 / (rank ** skew) for rank in range(1, n + 1)))
+
+def insert_batches(db, table, rows):
+  for start in range(0, len(rows), BATCH_SIZE):
+    db.session.execute(table.insert(), rows[start:start + BATCH_SIZE])
+
+# The rows are inserted with their ids, so move the Postgres sequences past them
+def reset_sequences(db, tables):
+  if db.engine.dialect.name != 'postgresql':
+    return
+  for table in tables:
+    db.session.execute(db.text(
+      "SELECT setval(pg_get_serial_sequence('\"%s\"', 'id'), coalesce(max(id), 0) + 1, false) FROM \"%s\""
+      % (table.name, table.name)))
+
+def make_people(rng, count, kind):
+  rows, genres = [], []
+  for i in range(1, count + 1):
+    city, state = rng.choice(CITIES)
+    name = ' '.join(rng.sample(WORDS, 2)).title()
+    if kind == 'venue':
+      name = '%s %s %d' % (name, rng.choice(VENUE_WORDS), i)
+    else:
+      name = '%s %d' % (name, i)
+    row = {'id': i,
+           'name': name,
+           'city': city,
+           'state': state,
+           'phone': '%03d-%03d-%04d' % (rng.randint(200, 999), rng.randint(200, 999), rng.randint(0, 9999)),
+           'image_link': 'https://images.example.com/%ss/%d.jpg' % (kind, i),
+           'seeking_description': 'Looking for %s' % ('artists' if kind == 'venue' else 'venues')}
+    if kind == 'venue':
+      row['address'] = '%d %s Street' % (rng.randint(1, 9999), rng.choice(WORDS).title())
+      row['seeking_talent'] = rng.random() < 0.3
+    else:
+      row['seeking_venue'] = rng.random() < 0.3
+    rows.append(row)
+    genres.append(rng.sample(range(1, len(GENRES) + 1), rng.randint(1, 3)))
+  return rows, genres
+
+# Shows of skewed venues and artists. A venue hosts one show per slot, so a
+# drawn slot that is already taken is drawn again.
+def make_shows(rng, num_venues, num_artists, num_shows, skew, date):
+  venue_weights = zipf_weights(num_venues, skew)
+  artist_weights = zipf_weights(num_artists, skew)
+  # Popularity is not ordered by id, or the busiest venues would all be the oldest
+  venue_ids = rng.sample(range(1, num_venues + 1), num_venues)
+  artist_ids = rng.sample(range(1, num_artists + 1), num_artists)
+  first_day = datetime(date.year, date.month, date.day) - timedelta(days=PAST_DAYS)
+  num_slots = (PAST_DAYS + FUTURE_DAYS) * len(SHOW_HOURS)
+  
+  shows, taken = [], set()
+  venues = rng.choices(venue_ids, cum_weights=venue_weights, k=num_shows)
+  artists = rng.choices(artist_ids, cum_weights=artist_weights, k=num_shows)
+  for venue_id, artist_id in zip(venues, artists):
+    for _ in range(10):
+      slot = rng.randrange(num_slots)
+      if (venue_id, slot) not in taken:
+        break
+    else:
+      continue
+    taken.add((venue_id, slot))
+    day, hour = divmod(slot, len(SHOW_HOURS))
+    shows.append({'id': len(shows) + 1,
+                  'venue_id': venue_id,
+                  'artist_id': artist_id,
+                  'start_time': first_day + timedelta(days=day, hours=SHOW_HOURS[hour])})
+  return shows
+
+# Fill an empty database and return a summary of what was generated
+def generate(db, venues=1000, artists=2000, shows=100000, seed=0, skew=0.8, date=None):
+  from models import (Artist, Genre, Show, Venue, artist_genres, refresh_show_counters,
+                      venue_genres)
+  
+  rng = random.Random(seed)
+  date = date or datetime.today()
+  
+  insert_batches(db, Genre.__table__, [{'id': i, 'name': name} for i, name in enumerate(GENRES, 1)])
+  for model, association, kind, count in ((Venue, venue_genres, 'venue', venues),
+                                          (Artist, artist_genres, 'artist', artists)):
+    rows, genres = make_people(rng, count, kind)
+    insert_batches(db, model.__table__, rows)
+    insert_batches(db, association, [{kind + '_id': row['id'], 'genre_id': genre_id}
+                                     for row, genre_ids in zip(rows, genres) for genre_id in genre_ids])
+  
+  show_rows = make_shows(rng, venues, artists, shows, skew, date)
+  insert_batches(db, Show.__table__, show_rows)
+  
+  connection = db.session.connection()
+  refresh_show_counters(connection, Venue, date=date)
+  refresh_show_counters(connection, Artist, date=date)
+  reset_sequences(db, (Genre.__table__, Venue.__table__, Artist.__table__, Show.__table__))
+  db.session.commit()
+  
+  per_venue = {}
+  for row in show_rows:
+    per_venue[row['venue_id']] = per_venue.get(row['venue_id'], 0) + 1
+  counts = sorted(per_venue.values(), reverse=True) or [0]
+  return {'venues': venues,
+          'artists': artists,
+          'shows': len(show_rows),
+          'busiest_venue_id': max(per_venue, key=per_venue.get) if per_venue else None,
+          'busiest_venue_shows': counts[0],
+          'median_venue_shows': counts[len(counts) // 2]}
+
+def main():
+  parser = argparse.ArgumentParser(description='Fill a database with synthetic venues, artists and shows.')
+  parser.add_argument('--database-url', default=config.SQLALCHEMY_DATABASE_URI)
+  parser.add_argument('--venues', type=int, default=1000)
+  parser.add_argument('--artists', type=int, default=2000)
+  parser.add_argument('--shows', type=int, default=100000)
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--skew', type=float, default=0.8, help='Zipf exponent of the shows per venue and artist.')
+  parser.add_argument('--drop', action='store_true', help='Drop and recreate the tables first.')
+  args = parser.parse_args()
+  
+  config.SQLALCHEMY_DATABASE_URI = args.database_url
+  from app import create_app
+  app = create_app()
+  from models import db
+  
+  with app.app_context():
+    if args.drop:
+      db.drop_all()
+    db.create_all()
+    started = time.perf_counter()
+    summary = generate(db, args.venues, args.artists, args.shows, args.seed, args.skew)
+    elapsed = time.perf_counter() - started
+  
+  print('%(venues)d venues, %(artists)d artists, %(shows)d shows' % summary)
+  print('busiest venue: %(busiest_venue_id)s with %(busiest_venue_shows)d shows, '
+        'median venue: %(median_venue_shows)d shows' % summary)
+  print('generated in %.1f s' % elapsed)
+
+if __name__ == '__main__':
+  main()
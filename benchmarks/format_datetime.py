@@ -0,0 +1,68 @@
+#----------------------------------------------------------------------------#
+# Benchmark: the datetime template filter on a page of show tiles.
+#
+# Usage: python benchmarks/format_datetime.py [--rows 10000]
+#----------------------------------------------------------------------------#
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import babel.dates
+import dateutil.parser
+
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from filters import format_datetime
+
+
+# Previous implementation of the filter, which the views fed with str(start_time)
+def legacy_format_datetime(value, format='medium'):
+  date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format, locale='en')
+
+def measure(func, values, repeat):
+  best = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    for value in values:
+      func(value, 'full')
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark the datetime template filter.')
+  parser.add_argument('--rows', type=int, default=10000)
+  parser.add_argument('--distinct', type=int, default=2000, help='number of distinct show times')
+  parser.add_argument('--repeat', type=int, default=3)
+  args = parser.parse_args()
+  
+  rng = random.Random(0)
+  start = datetime(2026, 1, 1, 20, 0)
+  times = [start + timedelta(days=rng.randint(0, 365), minutes=30 * rng.randint(0, 8)) for _ in range(args.distinct)]
+  values = [rng.choice(times) for _ in range(args.rows)]
+  
+  for value in times[:100]:
+    assert format_datetime(value, 'full') == legacy_format_datetime(str(value), 'full')
+  
+  legacy = measure(lambda value, format: legacy_format_datetime(str(value), format), values, args.repeat)
+  format_datetime.cache_clear()
+  cold = measure(format_datetime, values, 1)
+  warm = measure(format_datetime, values, args.repeat)
+  
+  print('rows: %d, distinct times: %d' % (args.rows, args.distinct))
+  print('legacy filter:       %8.1f ms' % (legacy * 1000))
+  print('new filter (cold):   %8.1f ms' % (cold * 1000))
+  print('new filter (warm):   %8.1f ms' % (warm * 1000))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,228 @@
+#----------------------------------------------------------------------------#
+# Load test: every route of the app, with Locust.
+#
+# Fill the database with benchmarks/datagen.py and start the app first, then
+#   locust -f benchmarks/locustfile.py --host http://localhost:8000 --headless \
+#     --users 50 --spawn-rate 10 --run-time 2m --venues 1000 --artists 2000 \
+#     --results-json results/load.json
+#
+# Visitors browse the listings, detail pages, searches and API; editors create,
+# edit and delete their own venues and artists and book shows; a scraper polls
+# the stats, metrics and jobs endpoints and downloads exports. Detail pages are
+# picked with the same Zipf-like skew as the generated shows, so a few of
+# them are hot. --results-json writes the stats of every route, which
+# benchmarks/compare_load.py compares between two runs.
+#----------------------------------------------------------------------------#
+
+import base64
+import json
+import os
+import random
+import subprocess
+import time
+import uuid
+
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from locust import HttpUser, between, events, task
+
+WORDS = ['blue', 'velvet', 'midnight', 'jazz', 'electric', 'soul', 'river', 'silver', 'echo', 'gold']
+GENRES = ['Jazz', 'Blues', 'Rock n Roll', 'Folk', 'Soul', 'Pop']
+
+@events.init_command_line_parser.add_listener
+def add_arguments(parser):
+  parser.add_argument('--venues', type=int, default=1000, help='Number of generated venues.')
+  parser.add_argument('--artists', type=int, default=2000, help='Number of generated artists.')
+  parser.add_argument('--skew', type=float, default=0.8, help='Zipf exponent of the page popularity.')
+  parser.add_argument('--results-json', default='', help='Write the stats of every route to this file.')
+
+# Draws ids from 1 to n, the i-th most popular one with weight 1 / i^skew
+class Popularity:
+  def __init__(self, n, skew, seed):
+    rng = random.Random(seed)
+    self.ids = rng.sample(range(1, n + 1), n)
+    self.weights = list(accumulate(1 / (rank ** skew) for rank in range(1, n + 1)))
+  
+  def choice(self):
+    return random.choices(self.ids, cum_weights=self.weights)[0]
+
+# Cursor of the API listings, positioned after the given id
+def after_id(id):
+  return base64.urlsafe_b64encode(json.dumps([id]).encode()).decode()
+
+def random_name():
+  return '%s %s' % (' '.join(random.sample(WORDS, 2)).title(), uuid.uuid4().hex[:8])
+
+def show_time():
+  day = datetime.today() + timedelta(days=random.randint(30, 3650))
+  return day.replace(hour=random.choice((18, 19, 20, 21, 22)), minute=0, second=0, microsecond=0)
+
+class FyyurUser(HttpUser):
+  abstract = True
+  
+  def on_start(self):
+    options = self.environment.parsed_options
+    self.num_venues, self.num_artists = options.venues, options.artists
+    self.venue_ids = Popularity(options.venues, options.skew, 0)
+    self.artist_ids = Popularity(options.artists, options.skew, 1)
+
+class Visitor(FyyurUser):
+  weight = 20
+  wait_time = between(0.5, 2)
+  
+  @task(3)
+  def index(self):
+    self.client.get('/')
+  
+  @task(5)
+  def venues(self):
+    self.client.get('/venues')
+  
+  @task(5)
+  def artists(self):
+    self.client.get('/artists')
+  
+  @task(3)
+  def shows(self):
+    self.client.get('/shows')
+  
+  @task(10)
+  def show_venue(self):
+    self.client.get('/venues/%d' % self.venue_ids.choice(), name='/venues/[id]')
+  
+  @task(10)
+  def show_artist(self):
+    self.client.get('/artists/%d' % self.artist_ids.choice(), name='/artists/[id]')
+  
+  @task(3)
+  def search_venues(self):
+    self.client.post('/venues/search', data={'search_term': random.choice(WORDS)})
+  
+  @task(3)
+  def search_artists(self):
+    self.client.post('/artists/search', data={'search_term': random.choice(WORDS)})
+  
+  @task(2)
+  def api_listings(self):
+    for kind in ('venues', 'artists', 'shows'):
+      self.client.get('/api/v1/%s' % kind, params={'limit': 50}, name='/api/v1/%s' % kind)
+  
+  @task(2)
+  def api_details(self):
+    self.client.get('/api/v1/venues/%d' % self.venue_ids.choice(), name='/api/v1/venues/[id]')
+    self.client.get('/api/v1/artists/%d' % self.artist_ids.choice(), name='/api/v1/artists/[id]')
+    self.client.get('/api/v1/shows/%d' % random.randint(1, 1000), name='/api/v1/shows/[id]')
+
+class Editor(FyyurUser):
+  weight = 2
+  wait_time = between(2, 5)
+  
+  # Id of the venue or artist just created under `name`, from the API listing
+  # of the ids past the generated ones
+  def find_created(self, kind, name, generated):
+    with self.client.get('/api/v1/%s' % kind, params={'after': after_id(generated), 'fields': 'id,name', 'limit': 1000},
+                         name='/api/v1/%s?after' % kind, catch_response=True) as response:
+      for item in response.json()['data']:
+        if item['name'] == name:
+          return item['id']
+      response.failure('%s not found after creation' % name)
+  
+  def profile(self, name, kind):
+    data = {'name': name, 'city': 'San Francisco', 'state': 'CA', 'phone': '415-555-0100',
+            'genres': random.sample(GENRES, 2), 'image_link': 'https://images.example.com/load-test.jpg',
+            'seeking_description': 'Load test'}
+    if kind == 'venues':
+      data['address'] = '1 Load Test Street'
+    return data
+  
+  @task(2)
+  def venue_lifecycle(self):
+    name = random_name()
+    self.client.get('/venues/create')
+    self.client.post('/venues/create', data=self.profile(name, 'venues'))
+    venue_id = self.find_created('venues', name, self.num_venues)
+    if venue_id is None:
+      return
+    self.client.get('/venues/%d/edit' % venue_id, name='/venues/[id]/edit')
+    self.client.post('/venues/%d/edit' % venue_id, data=self.profile(name + ' edited', 'venues'),
+                     name='/venues/[id]/edit')
+    self.client.get('/venues/%d' % venue_id, name='/venues/[id]')
+    self.client.delete('/venues/%d' % venue_id, name='/venues/[id]')
+  
+  @task(2)
+  def artist_lifecycle(self):
+    name = random_name()
+    self.client.get('/artists/create')
+    self.client.post('/artists/create', data=self.profile(name, 'artists'))
+    artist_id = self.find_created('artists', name, self.num_artists)
+    if artist_id is None:
+      return
+    self.client.get('/artists/%d/edit' % artist_id, name='/artists/[id]/edit')
+    self.client.post('/artists/%d/edit' % artist_id, data=self.profile(name + ' edited', 'artists'),
+                     name='/artists/[id]/edit')
+    self.client.get('/artists/%d' % artist_id, name='/artists/[id]')
+    self.client.delete('/artists/%d' % artist_id, name='/artists/[id]')
+  
+  @task(3)
+  def book_show(self):
+    self.client.get('/shows/create')
+    self.client.post('/shows/create', data={'venue_id': self.venue_ids.choice(),
+                                            'artist_id': self.artist_ids.choice(),
+                                            'start_time': show_time().strftime('%Y-%m-%d %H:%M:%S')})
+  
+  @task(1)
+  def book_shows(self):
+    shows = [{'venue_id': self.venue_ids.choice(),
+              'artist_id': self.artist_ids.choice(),
+              'start_time': show_time().strftime('%Y-%m-%d %H:%M:%S')} for _ in range(20)]
+    self.client.post('/api/v1/shows/batch', json=shows)
+
+class Scraper(FyyurUser):
+  weight = 1
+  wait_time = between(5, 15)
+  
+  @task(5)
+  def stats(self):
+    self.client.get('/metrics')
+    self.client.get('/cache/stats')
+    self.client.get('/db/stats')
+    self.client.get('/jobs', params={'limit': 20})
+  
+  @task(1)
+  def export(self):
+    start = datetime.today() - timedelta(days=7)
+    for kind, format in (('shows', 'csv'), ('venues', 'jsonl'), ('artists', 'csv')):
+      path = '/export/%s.%s' % (kind, format)
+      self.client.get(path, params={'start': start.date().isoformat()}, headers={'Accept-Encoding': 'gzip'}, name=path)
+
+def current_commit():
+  try:
+    return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                          capture_output=True, text=True, check=True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+@events.quitting.add_listener
+def write_results(environment, **kwargs):
+  path = environment.parsed_options.results_json if environment.parsed_options else ''
+  if not path:
+    return
+  routes = {}
+  for (name, method), entry in sorted(environment.stats.entries.items()):
+    routes['%s %s' % (method, name)] = {
+      'requests': entry.num_requests,
+      'failures': entry.num_failures,
+      'rps': entry.total_rps,
+      'mean_ms': entry.avg_response_time,
+      'p50_ms': entry.get_response_time_percentile(0.5),
+      'p95_ms': entry.get_response_time_percentile(0.95),
+      'p99_ms': entry.get_response_time_percentile(0.99)}
+  results = {'commit': current_commit(),
+             'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+             'users': environment.parsed_options.num_users,
+             'routes': routes}
+  if os.path.dirname(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+  with open(path, 'w') as file:
+    json.dump(results, file, indent=2, sort_keys=True)
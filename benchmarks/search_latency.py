@@ -0,0 +1,87 @@
+#----------------------------------------------------------------------------#
+# Benchmark: p50/p99 latency of artist search.
+#
+# Usage: python benchmarks/search_latency.py [--database-url URL] [--artists 100000]
+#----------------------------------------------------------------------------#
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import config
+
+WORDS = ['the', 'blue', 'velvet', 'midnight', 'jazz', 'quartet', 'electric', 'soul', 'brothers',
+         'sisters', 'band', 'orchestra', 'riot', 'echo', 'gold', 'river', 'silver', 'wolves',
+         'hop', 'dueling', 'pianos', 'live', 'music', 'park', 'square', 'crystal', 'machine']
+CITIES = [('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'), ('Chicago', 'IL'),
+          ('Seattle', 'WA'), ('Nashville', 'TN'), ('New Orleans', 'LA')]
+GENRES = ['Jazz', 'Rock n Roll', 'Blues', 'Folk', 'Classical', 'Hip-Hop', 'Soul', 'Pop']
+
+def seed(db, Artist, Genre, artist_genres, num_artists, rng):
+  genres = [Genre(name=name) for name in GENRES]
+  db.session.add_all(genres)
+  db.session.flush()
+  
+  rows, links = [], []
+  for i in range(1, num_artists + 1):
+    city, state = rng.choice(CITIES)
+    rows.append({'id': i,
+                 'name': '%s %d' % (' '.join(rng.sample(WORDS, 3)).title(), i),
+                 'city': city,
+                 'state': state})
+    links.extend({'artist_id': i, 'genre_id': genre.id} for genre in rng.sample(genres, 2))
+    if len(rows) == 10000 or i == num_artists:
+      db.session.execute(Artist.__table__.insert(), rows)
+      db.session.execute(artist_genres.insert(), links)
+      rows, links = [], []
+  db.session.commit()
+
+def percentile(samples, fraction):
+  samples = sorted(samples)
+  return samples[min(int(len(samples) * fraction), len(samples) - 1)]
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark artist search latency.')
+  parser.add_argument('--database-url', default='sqlite://')
+  parser.add_argument('--artists', type=int, default=100000)
+  parser.add_argument('--queries', type=int, default=500)
+  parser.add_argument('--seed', type=int, default=0)
+  args = parser.parse_args()
+  
+  config.SQLALCHEMY_DATABASE_URI = args.database_url
+  from app import create_app
+  app = create_app()
+  from models import Artist, Genre, artist_genres, db
+  from search import get_backend, search
+  
+  rng = random.Random(args.seed)
+  terms = [rng.choice(WORDS)[:rng.randint(3, 6)] for _ in range(args.queries)] \
+    + [rng.choice(CITIES)[0] for _ in range(args.queries // 10)] \
+    + [rng.choice(GENRES) for _ in range(args.queries // 10)]
+  rng.shuffle(terms)
+  
+  with app.app_context():
+    db.drop_all()
+    db.create_all()
+    seed(db, Artist, Genre, artist_genres, args.artists, rng)
+    
+    search(Artist, terms[0])  # warm up caches and indexes
+    
+    samples = []
+    for term in terms:
+      start = time.perf_counter()
+      search(Artist, term)
+      samples.append(time.perf_counter() - start)
+      db.session.remove()
+    
+    print('backend: %s, artists: %d, queries: %d' % (type(get_backend()).__name__, args.artists, len(terms)))
+    print('p50: %.2f ms' % (percentile(samples, 0.50) * 1000))
+    print('p99: %.2f ms' % (percentile(samples, 0.99) * 1000))
+    db.drop_all()
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,86 @@
+#----------------------------------------------------------------------------#
+# Benchmark: cold start time of the app, from python -X importtime.
+#
+# Each run imports app and calls create_app() in a fresh interpreter, or only
+# imports it in checkouts that build the app on import. With --compare-to,
+# the same is measured in another checkout (e.g. the base branch) and the
+# script exits with status 1 when this one is slower by more than
+# --tolerance. A checkout that fails to start is reported, not compared.
+#
+# Usage: python benchmarks/startup.py [--runs 10] [--compare-to ../base] [--tolerance 0.2]
+#----------------------------------------------------------------------------#
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+SCRIPT = "import app; getattr(app, 'create_app', lambda: None)()"
+
+# Cumulative import time in microseconds of the top-level modules and of the
+# modules they import, from the "import time: self | cumulative | name" lines
+# of -X importtime. The total only counts the top-level modules.
+def parse_importtime(output):
+  total, modules = 0, {}
+  for line in output.splitlines():
+    if not line.startswith('import time:') or 'cumulative' in line:
+      continue
+    _, cumulative, name = line[len('import time:'):].split('|')
+    depth = (len(name) - len(name.lstrip()) - 1) // 2
+    if depth == 0:
+      total += int(cumulative)
+    if depth <= 1:
+      modules[name.strip()] = int(cumulative)
+  return total, modules
+
+def measure(path, runs):
+  env = dict(os.environ, DATABASE_URL='sqlite://', PYTHONDONTWRITEBYTECODE='')
+  totals, walls, modules = [], [], {}
+  for _ in range(runs):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', SCRIPT],
+                            cwd=path, env=env, capture_output=True, text=True, check=True)
+    walls.append(time.perf_counter() - started)
+    total, modules = parse_importtime(result.stderr)
+    totals.append(total / 1000)
+  return statistics.median(totals), statistics.median(walls) * 1000, modules
+
+def report(label, imports, wall, modules, top):
+  print('%s: imports %.1f ms, process %.1f ms' % (label, imports, wall))
+  for name, cumulative in sorted(modules.items(), key=lambda item: -item[1])[:top]:
+    print('  %8.1f ms  %s' % (cumulative / 1000, name))
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark the cold start time of the app.')
+  parser.add_argument('--runs', type=int, default=10)
+  parser.add_argument('--top', type=int, default=10, help='Slowest top-level imports to list.')
+  parser.add_argument('--compare-to', help='Checkout to compare against.')
+  parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown, as a fraction.')
+  args = parser.parse_args()
+  
+  # The first run fills the bytecode caches
+  measure(ROOT, 1)
+  imports, wall, modules = measure(ROOT, args.runs)
+  report('this checkout', imports, wall, modules, args.top)
+  if not args.compare_to:
+    return
+  
+  try:
+    measure(args.compare_to, 1)
+  except subprocess.CalledProcessError as error:
+    print('%s does not start, not comparing:\n%s' % (args.compare_to, error.stderr.strip().splitlines()[-1]))
+    return
+  base_imports, base_wall, base_modules = measure(args.compare_to, args.runs)
+  report(args.compare_to, base_imports, base_wall, base_modules, args.top)
+  
+  change = imports / base_imports - 1
+  print('import time change: %+.1f%%' % (change * 100))
+  if change > args.tolerance:
+    sys.exit(1)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,91 @@
+#----------------------------------------------------------------------------#
+# Tests: the background job queue, with the jobs run by the tests themselves
+# rather than by worker threads.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import jobs
+from models import Job, db
+
+@pytest.fixture
+def queue(app, session, monkeypatch):
+  monkeypatch.setitem(app.config, 'JOB_THREADS', 0)
+  monkeypatch.setitem(app.config, 'JOB_MAX_ATTEMPTS', 2)
+  yield
+  with db.engine.begin() as connection:
+    connection.execute(Job.__table__.delete())
+
+def failing(report):
+  raise RuntimeError('failed')
+
+def claim():
+  with db.engine.begin() as connection:
+    return jobs.claim(connection)
+
+#  Backoff
+#  ----------------------------------------------------------------
+
+def test_backoff_doubles_up_to_the_maximum(app, monkeypatch):
+  monkeypatch.setattr(jobs.random, 'uniform', lambda low, high: high)
+  with app.app_context():
+    assert [jobs.backoff(attempts) for attempts in (1, 2, 3)] == [10, 20, 40]
+    assert jobs.backoff(20) == app.config['JOB_RETRY_MAX_BACKOFF']
+
+def test_backoff_jitter(app):
+  with app.app_context():
+    assert all(5 <= jobs.backoff(1) <= 10 for _ in range(100))
+
+#  Leases
+#  ----------------------------------------------------------------
+
+def test_running_job_is_not_claimed_again(queue):
+  id = jobs.enqueue('roll_counters', {})
+  job = claim()
+  assert (job.id, job.attempts) == (id, 1)
+  assert claim() is None
+  assert jobs.get_job(id)['locked_until'] > datetime.utcnow()
+
+def test_expired_lease_is_claimed_again(queue):
+  id = jobs.enqueue('roll_counters', {})
+  claim()
+  jobs.update_job(id, locked_until=datetime.utcnow() - timedelta(seconds=1))
+  job = claim()
+  assert (job.id, job.attempts) == (id, 2)
+
+def test_expired_lease_on_last_attempt_fails_the_job(queue):
+  id = jobs.enqueue('roll_counters', {}, key='test-lost', max_attempts=1)
+  claim()
+  jobs.update_job(id, locked_until=datetime.utcnow() - timedelta(seconds=1))
+  assert claim() is None
+  assert jobs.purge_jobs(report=None)['failed'] == 1
+  job = jobs.get_job(id)
+  assert (job['status'], job['key']) == ('failed', None)
+
+#  Failures
+#  ----------------------------------------------------------------
+
+def test_failed_job_is_retried_then_fails(queue, monkeypatch):
+  monkeypatch.setattr(jobs, 'get_handler', lambda kind: failing)
+  id = jobs.enqueue('roll_counters', {}, key='test-retry')
+  
+  jobs.run(claim())
+  job = jobs.get_job(id)
+  assert (job['status'], job['attempts']) == ('queued', 1)
+  assert job['run_at'] > datetime.utcnow()
+  assert 'RuntimeError' in job['error']
+  assert claim() is None
+  
+  jobs.update_job(id, run_at=datetime.utcnow())
+  jobs.run(claim())
+  job = jobs.get_job(id)
+  assert (job['status'], job['attempts'], job['key']) == ('failed', 2, None)
+
+def test_key_is_released_by_failure(queue, monkeypatch):
+  monkeypatch.setattr(jobs, 'get_handler', lambda kind: failing)
+  id = jobs.enqueue('roll_counters', {}, key='test-key', max_attempts=1)
+  assert jobs.enqueue('roll_counters', {}, key='test-key') == id
+  jobs.run(claim())
+  assert jobs.enqueue('roll_counters', {}, key='test-key') != id
@@ -0,0 +1,71 @@
+#----------------------------------------------------------------------------#
+# Tests: show scheduling, on the generated data.
+#
+# Shows are proposed in 2045, after every generated show, and deleted after
+# each test.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import Artist, Show, Venue, db, refresh_show_counters
+from scheduling import find_conflicts, schedule_shows
+
+START = datetime(2045, 6, 1, 20, 0)
+DURATION = timedelta(hours=3)
+
+def bookings(*hours):
+  return [(START + timedelta(hours=hour), index, {'show_id': index}) for index, hour in enumerate(hours)]
+
+#  Overlaps
+#  ----------------------------------------------------------------
+
+@pytest.mark.parametrize('hours, conflicts', [
+  (0, [0]),
+  (2.9, [0]),
+  (3, []),
+  (-2.9, [0]),
+  (-3, []),
+])
+def test_find_conflicts_boundaries(hours, conflicts):
+  found = find_conflicts(bookings(0), START + timedelta(hours=hours), DURATION)
+  assert [conflict['show_id'] for conflict in found] == conflicts
+
+def test_find_conflicts_between_bookings():
+  found = find_conflicts(bookings(-3, 0, 3, 6), START + timedelta(hours=1), DURATION)
+  assert [conflict['show_id'] for conflict in found] == [1, 2]
+  assert found[0]['start_time'] == START
+
+def test_find_conflicts_empty():
+  assert find_conflicts([], START, DURATION) == []
+
+#  Batches
+#  ----------------------------------------------------------------
+
+@pytest.fixture
+def pair(session):
+  venue_id, artist_id = db.session.query(Show.venue_id, Show.artist_id).first()
+  yield venue_id, artist_id
+  with db.engine.begin() as connection:
+    connection.execute(Show.__table__.delete().where(Show.__table__.c.start_time >= START))
+    refresh_show_counters(connection, Venue, {venue_id})
+    refresh_show_counters(connection, Artist, {artist_id})
+
+def proposal(pair, hours):
+  venue_id, artist_id = pair
+  return {'venue_id': venue_id, 'artist_id': artist_id,
+          'start_time': (START + timedelta(hours=hours)).isoformat()}
+
+def test_schedule_shows_checks_accepted_proposals(pair):
+  report = schedule_shows([proposal(pair, 0), proposal(pair, 2), proposal(pair, 3)])
+  assert [entry['status'] for entry in report] == ['created', 'conflict', 'created']
+  assert {conflict['side'] for conflict in report[1]['conflicts']} == {'venue', 'artist'}
+  assert all(conflict['index'] == 0 for conflict in report[1]['conflicts'])
+
+def test_schedule_shows_checks_existing_shows(pair):
+  created = schedule_shows([proposal(pair, 0)])[0]
+  report = schedule_shows([proposal(pair, 1), {'venue_id': 'x'}])
+  assert report[0]['status'] == 'conflict'
+  assert report[0]['conflicts'][0]['show_id'] == created['id']
+  assert report[1]['status'] == 'invalid'
@@ -0,0 +1,53 @@
+#----------------------------------------------------------------------------#
+# Tests: idempotent form writes, on the generated data.
+#
+# Writes run in the session's transaction, rolled back after each test.
+#----------------------------------------------------------------------------#
+
+import pytest
+
+from models import Venue, db
+from writes import create_entity, run_idempotent
+
+@pytest.fixture
+def venue(session):
+  venue = Venue.query.first()
+  return {'name': venue.name, 'city': venue.city, 'state': venue.state,
+          'address': venue.address, 'phone': '123-123-1234'}
+
+# write(connection) recording its calls
+def recording(result):
+  calls = []
+  def write(connection):
+    calls.append(connection)
+    return result
+  write.calls = calls
+  return write
+
+def test_run_idempotent_runs_once_per_key(session):
+  write = recording({'status': 'created', 'id': 1})
+  assert run_idempotent('test-once', write) == {'status': 'created', 'id': 1}
+  assert run_idempotent('test-once', write) == {'status': 'created', 'id': 1, 'replayed': True}
+  assert len(write.calls) == 1
+
+def test_run_idempotent_without_key(session):
+  write = recording({'status': 'created', 'id': 1})
+  run_idempotent(None, write)
+  assert run_idempotent(None, write) == {'status': 'created', 'id': 1}
+  assert len(write.calls) == 2
+
+def test_run_idempotent_replays_conflicts(session, venue):
+  def write(connection):
+    return create_entity(connection, Venue, venue, [])
+  
+  first = run_idempotent('test-conflict', write)
+  assert first['status'] == 'conflict'
+  count = Venue.query.count()
+  assert run_idempotent('test-conflict', write) == dict(first, replayed=True)
+  assert Venue.query.count() == count
+
+def test_run_idempotent_keys_are_separate(session):
+  first, second = recording({'status': 'created', 'id': 1}), recording({'status': 'created', 'id': 2})
+  run_idempotent('test-first', first)
+  assert run_idempotent('test-second', second) == {'status': 'created', 'id': 2}
+  assert len(second.calls) == 1
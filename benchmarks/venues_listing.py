@@ -0,0 +1,101 @@
+#----------------------------------------------------------------------------#
+# Benchmark: /venues listing, per-area N+1 loop vs. single listing query.
+#
+# Usage: python benchmarks/venues_listing.py [--database-url URL] [--sizes 100,1000]
+#----------------------------------------------------------------------------#
+
+import argparse
+import os
+import sys
+import time
+
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import config
+
+
+# Previous implementation of the /venues view, kept here for comparison
+def legacy_areas(Venue, date):
+  cities_states = Venue.query.with_entities(Venue.city, Venue.state).distinct().all()
+  
+  data = []
+  for city_state in cities_states:
+    venues = Venue.query.filter_by(city=city_state.city, state=city_state.state).all()
+    
+    for venue in venues:
+      venue.num_upcoming_shows = len(venue.get_upcoming_shows(date))
+    
+    data.append({"city": city_state.city,
+                 "state": city_state.state,
+                 "venues": venues
+                 })
+  return data
+
+def listing_areas(Venue):
+  venues = Venue.get_listing().order_by(Venue.city, Venue.state, Venue.name, Venue.id)
+  return [(area['city'], area['state'], list(area['venues'])) for area in Venue.get_areas(venues)]
+
+def seed(db, Artist, Venue, Show, num_venues, shows_per_venue=5):
+  now = datetime.today()
+  artists = [Artist(name='Artist %d' % i, city='City', state='NY')
+             for i in range(max(num_venues // 10, 1))]
+  db.session.add_all(artists)
+  db.session.flush()
+  
+  for i in range(num_venues):
+    venue = Venue(name='Venue %d' % i, city='City %d' % (i % 50), state='NY',
+                  address='Address %d' % i)
+    db.session.add(venue)
+    db.session.flush()
+    for j in range(shows_per_venue):
+      db.session.add(Show(venue_id=venue.id,
+                          artist_id=artists[(i + j) % len(artists)].id,
+                          start_time=now + timedelta(days=j - shows_per_venue // 2)))
+  db.session.commit()
+
+def measure(db, func):
+  queries = []
+  
+  def count_query(conn, cursor, statement, parameters, context, executemany):
+    queries.append(statement)
+  
+  db.event.listen(db.engine, 'before_cursor_execute', count_query)
+  start = time.perf_counter()
+  try:
+    func()
+  finally:
+    elapsed = time.perf_counter() - start
+    db.event.remove(db.engine, 'before_cursor_execute', count_query)
+    db.session.remove()
+  return len(queries), elapsed
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark the /venues listing queries.')
+  parser.add_argument('--database-url', default='sqlite://')
+  parser.add_argument('--sizes', default='100,1000,5000')
+  args = parser.parse_args()
+  
+  config.SQLALCHEMY_DATABASE_URI = args.database_url
+  from app import create_app
+  app = create_app()
+  from models import Artist, Venue, Show, db
+  
+  print('%8s  %14s  %12s  %14s  %12s' % ('venues', 'legacy queries', 'legacy ms', 'listing queries', 'listing ms'))
+  with app.app_context():
+    for size in [int(size) for size in args.sizes.split(',')]:
+      db.drop_all()
+      db.create_all()
+      seed(db, Artist, Venue, Show, size)
+      
+      today = datetime.today()
+      legacy_queries, legacy_time = measure(db, lambda: legacy_areas(Venue, today))
+      listing_queries, listing_time = measure(db, lambda: listing_areas(Venue))
+      
+      print('%8d  %14d  %12.1f  %15d  %12.1f' % (size, legacy_queries, legacy_time * 1000,
+                                                   listing_queries, listing_time * 1000))
+    db.drop_all()
+
+if __name__ == '__main__':
+  main()
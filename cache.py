@@ -0,0 +1,234 @@
+import pickle
+import threading
+import time
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from flask import current_app, g, make_response, request, session
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#
+# Rendered GET pages are stored with a set of tags ("venues", "venue:3", ...)
+# and dropped by tag from the write paths. Backends store the pages and the
+# tag -> keys index; the in-process LRU is per worker, so deployments with
+# more than one worker should use the Redis backend.
+#
+# Backends also remember when each tag was last invalidated, for `remember`
+# seconds. A page is not stored when one of its tags was invalidated while it
+# was rendered, or, for pages rendered on a read replica, within the last
+# REPLICA_PIN_SECONDS: the replica may not have replayed that write yet.
+#----------------------------------------------------------------------------#
+
+# In-process LRU cache with per-entry expiry and a cap on the number of entries
+class LRUCache:
+  def __init__(self, max_entries=1024, default_ttl=60, remember=60):
+    self.max_entries = max_entries
+    self.default_ttl = default_ttl
+    self.remember = remember
+    self.entries = OrderedDict()
+    self.tags = {}
+    self.invalidated = {}
+    self.lock = threading.Lock()
+  
+  def get(self, key):
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is None:
+        return None
+      value, expires_at, _ = entry
+      if expires_at <= time.monotonic():
+        self._remove(key)
+        return None
+      self.entries.move_to_end(key)
+      return value
+  
+  def set(self, key, value, ttl=None, tags=()):
+    ttl = self.default_ttl if ttl is None else ttl
+    with self.lock:
+      if key in self.entries:
+        self._remove(key)
+      self.entries[key] = (value, time.monotonic() + ttl, tuple(tags))
+      for tag in tags:
+        self.tags.setdefault(tag, set()).add(key)
+      while len(self.entries) > self.max_entries:
+        self._remove(next(iter(self.entries)))
+  
+  def invalidate(self, *tags):
+    now = time.time()
+    with self.lock:
+      for tag in tags:
+        self.invalidated[tag] = now
+        for key in self.tags.pop(tag, ()):
+          self._remove(key)
+      if len(self.invalidated) > self.max_entries:
+        self.invalidated = {tag: at for tag, at in self.invalidated.items() if at > now - self.remember}
+  
+  # Whether any of the tags was invalidated after `since`, a time.time()
+  def invalidated_since(self, tags, since):
+    with self.lock:
+      return any(self.invalidated.get(tag, 0) > since for tag in tags)
+  
+  def clear(self):
+    with self.lock:
+      self.entries.clear()
+      self.tags.clear()
+  
+  def __len__(self):
+    return len(self.entries)
+  
+  def _remove(self, key):
+    entry = self.entries.pop(key, None)
+    if entry is None:
+      return
+    for tag in entry[2]:
+      keys = self.tags.get(tag)
+      if keys is not None:
+        keys.discard(key)
+        if not keys:
+          del self.tags[tag]
+
+# Adapter for Redis or any server speaking its protocol. Each tag is a set of
+# the keys stored with it.
+class RedisCache:
+  def __init__(self, url, default_ttl=60, prefix='fyyur:', remember=60):
+    import redis
+    self.client = redis.Redis.from_url(url)
+    self.default_ttl = default_ttl
+    self.prefix = prefix
+    self.remember = remember
+  
+  def get(self, key):
+    value = self.client.get(self.prefix + key)
+    return None if value is None else pickle.loads(value)
+  
+  def set(self, key, value, ttl=None, tags=()):
+    ttl = self.default_ttl if ttl is None else ttl
+    pipeline = self.client.pipeline()
+    pipeline.set(self.prefix + key, pickle.dumps(value), ex=max(int(ttl), 1))
+    for tag in tags:
+      pipeline.sadd(self.prefix + 'tag:' + tag, key)
+    pipeline.execute()
+  
+  def invalidate(self, *tags):
+    for tag in tags:
+      tag_key = self.prefix + 'tag:' + tag
+      keys = self.client.smembers(tag_key)
+      pipeline = self.client.pipeline()
+      for key in keys:
+        pipeline.delete(self.prefix + key.decode())
+      pipeline.delete(tag_key)
+      pipeline.set(tag_key + ':invalidated', time.time(), ex=max(int(self.remember), 1))
+      pipeline.execute()
+  
+  def invalidated_since(self, tags, since):
+    if not tags:
+      return False
+    times = self.client.mget([self.prefix + 'tag:' + tag + ':invalidated' for tag in tags])
+    return any(at is not None and float(at) > since for at in times)
+  
+  def clear(self):
+    for key in self.client.scan_iter(self.prefix + '*'):
+      self.client.delete(key)
+  
+  def __len__(self):
+    return sum(1 for key in self.client.scan_iter(self.prefix + '*') if b'tag:' not in key)
+
+class PageCache:
+  def __init__(self, app=None):
+    self.backend = None
+    self.hits = 0
+    self.misses = 0
+    if app is not None:
+      self.init_app(app)
+  
+  def init_app(self, app):
+    backend = app.config.get('CACHE_BACKEND')
+    # Longer than any render, and than the window of replica rendered pages
+    remember = app.config['REPLICA_PIN_SECONDS'] + 60
+    if backend == 'memory':
+      self.backend = LRUCache(app.config['CACHE_MAX_ENTRIES'], app.config['CACHE_DEFAULT_TTL'], remember=remember)
+    elif backend == 'redis':
+      self.backend = RedisCache(app.config['CACHE_REDIS_URL'], app.config['CACHE_DEFAULT_TTL'], remember=remember)
+    elif backend is not None:
+      raise ValueError('Unknown cache backend: %s' % backend)
+  
+  # Cache the page rendered by a view for `ttl` seconds (the backend default
+  # when None, or the config value of that name when a string). Tags are formatted with the view arguments, and views can add
+  # more with tag() or bring the expiry forward with expire_at() while rendering.
+  def cached(self, *tags, ttl=None):
+    def decorator(view):
+      @wraps(view)
+      def wrapper(**kwargs):
+        # Pages with pending flash messages are personal, render them fresh
+        if self.backend is None or request.method != 'GET' or '_flashes' in session:
+          return view(**kwargs)
+        
+        key = 'page:' + request.full_path
+        page = self.backend.get(key)
+        if page is not None:
+          self.hits += 1
+          g.cache_result = 'hit'
+          body, status, headers = page
+          return body, status, headers
+        self.misses += 1
+        g.cache_result = 'miss'
+        
+        g.cache_tags = [tag.format(**kwargs) for tag in tags]
+        g.cache_expires_at = None
+        started = time.time()
+        response = make_response(view(**kwargs))
+        if g.get('replica') is not None:
+          started -= current_app.config['REPLICA_PIN_SECONDS']
+        
+        entry_ttl = ttl if ttl is not None else self.backend.default_ttl
+        if isinstance(entry_ttl, str):
+          entry_ttl = current_app.config[entry_ttl]
+        if g.cache_expires_at is not None:
+          entry_ttl = min(entry_ttl, (g.cache_expires_at - datetime.today()).total_seconds())
+        
+        if response.status_code == 200 and not response.is_streamed and entry_ttl > 0 \
+            and not self.backend.invalidated_since(g.cache_tags, started):
+          self.backend.set(key,
+                           (response.get_data(), response.status_code, {'Content-Type': response.content_type}),
+                           ttl=entry_ttl,
+                           tags=g.cache_tags)
+        return response
+      return wrapper
+    return decorator
+  
+  # Render pages without the cache, to inspect their queries
+  @contextmanager
+  def disabled(self):
+    backend, self.backend = self.backend, None
+    try:
+      yield
+    finally:
+      self.backend = backend
+  
+  def tag(self, *tags):
+    if 'cache_tags' in g:
+      g.cache_tags.extend(tags)
+  
+  # Expire the page being cached no later than `when`, a naive local datetime
+  # like the ones the views compare show start times against
+  def expire_at(self, when):
+    if when is not None and 'cache_tags' in g:
+      if g.cache_expires_at is None or when < g.cache_expires_at:
+        g.cache_expires_at = when
+  
+  def invalidate(self, *tags):
+    if self.backend is not None:
+      self.backend.invalidate(*tags)
+  
+  def stats(self):
+    lookups = self.hits + self.misses
+    return {'backend': type(self.backend).__name__ if self.backend else None,
+            'entries': len(self.backend) if self.backend else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0}
+
+cache = PageCache()
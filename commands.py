@@ -0,0 +1,148 @@
+import click
+import sys
+
+from cache import cache
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+from models import Artist, Venue, db, find_stale_show_counters, refresh_show_counters, roll_show_counters
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@click.group(cls=AppGroup)
+def counters():
+  """Maintain the show counters of venues and artists."""
+
+@counters.command('roll')
+def roll_counters():
+  """Move shows that have started from the upcoming to the past counters."""
+  with db.engine.begin() as connection:
+    rolled = roll_show_counters(connection)
+  click.echo('Rolled the counters of %d venues and artists.' % rolled)
+
+@counters.command('check')
+@click.option('--repair', is_flag=True, help='Recompute the counters found out of date.')
+def check_counters(repair):
+  """Compare the show counters with the shows."""
+  stale = 0
+  with db.engine.begin() as connection:
+    for model in (Venue, Artist):
+      ids = find_stale_show_counters(connection, model)
+      stale += len(ids)
+      click.echo('%s: %d out of date %s' % (model.__tablename__, len(ids), sorted(ids)[:20]))
+      if repair and ids:
+        refresh_show_counters(connection, model, ids)
+  if stale and not repair:
+    sys.exit(1)
+
+@click.command('explain-views')
+@with_appcontext
+def explain_views():
+  """Check that the queries of the main pages read Show through an index."""
+  from explain import check_views
+  failures, checked = check_views(current_app._get_current_object())
+  for path, statement, scans in failures:
+    click.echo('%s: %s\n  %s' % (path, ', '.join(scans), ' '.join(statement.split())))
+  click.echo('%d of %d queries on Show scan it sequentially.' % (len(failures), checked))
+  if failures:
+    sys.exit(1)
+
+@click.command('check-queries')
+@with_appcontext
+def check_queries():
+  """Compare the number of queries of the main pages, searches and API with their budgets."""
+  from explain import budgeted_requests
+  from instrumentation import query_budget, query_count
+  app = current_app._get_current_object()
+  adapter = app.url_map.bind('localhost')
+  over = 0
+  strict, app.config['QUERY_BUDGET_STRICT'] = app.config['QUERY_BUDGET_STRICT'], False
+  try:
+    with cache.disabled():
+      client = app.test_client()
+      for method, path, form in budgeted_requests():
+        endpoint, _ = adapter.match(path, method=method)
+        response = client.open(path, method=method, data=form)
+        count, budget = query_count(response), query_budget(endpoint)
+        over += response.status_code != 200 or (budget is not None and count > budget)
+        click.echo('%-4s %-28s %3d queries, budget %s, status %d' % (method, path, count, budget, response.status_code))
+  finally:
+    app.config['QUERY_BUDGET_STRICT'] = strict
+  if over:
+    sys.exit(1)
+
+@click.command('import')
+@with_appcontext
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows written per transaction.')
+@click.option('--checkpoint', type=click.Path(dir_okay=False), help='File recording progress, to resume a failed import.')
+def import_rows(kind, path, format, batch_size, checkpoint):
+  """Import venues, artists or shows from a CSV or JSON Lines file."""
+  from importer import run_import
+  stats = run_import(kind, path, format, batch_size, checkpoint, echo=click.echo)
+  # Only a shared backend reaches the caches of the web processes
+  if current_app.config['CACHE_BACKEND'] == 'memory':
+    click.echo('The page cache is per process: pages cached by the app may show the old data until they expire.')
+  cache.invalidate(kind, *(['venues', 'artists'] if kind == 'shows' else []), *stats['tags'])
+  click.echo('Imported %d %s in %.1fs, %d rows rejected.' % (stats['written'], kind, stats['elapsed'], stats['rejected']))
+
+@click.command('export')
+@with_appcontext
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.option('--format', type=click.Choice(['csv', 'jsonl']), default='csv', show_default=True)
+@click.option('--output', type=click.File('wb'), default='-', help='Defaults to the standard output.')
+@click.option('--gzip', is_flag=True, help='Compress the output.')
+@click.option('--start', type=click.DateTime(), help='Only shows starting from this date.')
+@click.option('--end', type=click.DateTime(), help='Only shows starting before this date.')
+def export_rows(kind, format, output, gzip, start, end):
+  """Export venues, artists or shows as CSV or JSON Lines."""
+  from exporter import export, gzip_chunks
+  chunks = export(kind, format, start, end)
+  for chunk in gzip_chunks(chunks) if gzip else chunks:
+    output.write(chunk)
+
+@click.command('purge-idempotency-keys')
+@with_appcontext
+def purge_keys():
+  """Delete the idempotency keys of form posts older than IDEMPOTENCY_KEY_TTL."""
+  from writes import purge_idempotency_keys
+  with db.engine.begin() as connection:
+    purged = purge_idempotency_keys(connection)
+  click.echo('Purged %d idempotency keys.' % purged)
+
+@click.command('worker')
+@with_appcontext
+@click.option('--processes', type=int, help='Defaults to JOB_WORKER_PROCESSES.')
+@click.option('--threads', type=int, help='Threads per process, defaults to JOB_WORKER_THREADS.')
+@click.option('--burst', is_flag=True, help='Exit once no job is due.')
+def worker(processes, threads, burst):
+  """Run the background jobs."""
+  import jobs
+  import multiprocessing
+  import signal
+  config = current_app.config
+  processes = processes or config['JOB_WORKER_PROCESSES']
+  threads = threads or config['JOB_WORKER_THREADS']
+  click.echo('Running jobs on %d process(es) of %d thread(s).' % (processes, threads))
+  if processes == 1:
+    jobs.work(threads, burst, current_app._get_current_object())
+    return
+  
+  # Each process builds its own app, and with it its own connection pool
+  context = multiprocessing.get_context('spawn')
+  children = [context.Process(target=jobs.work, args=(threads, burst), name='worker-%d' % index)
+              for index in range(processes)]
+  for child in children:
+    child.start()
+  for signum in (signal.SIGTERM, signal.SIGINT):
+    signal.signal(signum, lambda signum, frame: [child.terminate() for child in children if child.is_alive()])
+  for child in children:
+    child.join()
+
+
+def init_app(app):
+  for command in (counters, explain_views, check_queries, import_rows, export_rows, purge_keys, worker):
+    app.cli.add_command(command)
@@ -3,9 +3,168 @@ SECRET_KEY = os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+# Debug mode, off unless FLASK_DEBUG=1 (as set by `flask run --debug`)
+DEBUG = os.environ.get('FLASK_DEBUG', '0') == '1'
+
+# Errors are logged to this file when debug mode is off
+LOG_FILE = os.environ.get('LOG_FILE', 'error.log')
 
 # Connect to the database
-SQLALCHEMY_DATABASE_URI = "postgresql://postgres@localhost:5432/fyyur"
-SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', "postgresql://postgres@localhost:5432/fyyur")
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool of each worker process. With gunicorn, workers x
+# (DB_POOL_SIZE + DB_MAX_OVERFLOW) must stay below the server's max_connections.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+# Seconds to wait for a connection before failing the request
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+# Seconds after which connections are replaced, -1 to keep them
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+# Test connections on checkout, so restarts of the server or PgBouncer are not
+# seen as errors by requests
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+# Milliseconds after which a statement is cancelled, 0 for no limit
+DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 0))
+# Set when connecting through PgBouncer in transaction pooling mode: session
+# settings are then made per transaction and prepared statements are not cached
+DB_TRANSACTION_POOLING = os.environ.get('DB_TRANSACTION_POOLING', '0') == '1'
+
+# Read replicas for the listing, search and detail pages, comma separated
+SQLALCHEMY_REPLICA_URIS = [url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url]
+# Seconds behind the primary after which a replica is not used
+REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', 5))
+REPLICA_LAG_CHECK_INTERVAL = 10
+# Seconds during which a client reads from the primary after a write
+REPLICA_PIN_SECONDS = 10
+
+# Maximum number of past and upcoming shows rendered on a venue or artist page
+SHOWS_PER_PAGE = 50
+
+# Number of rows per page on the venue, artist and show listings
+LISTING_PAGE_SIZE = 100
+
+# Stream listing pages to the client while they are rendered
+STREAM_TEMPLATES = False
+
+# Search backend: "postgres" (pg_trgm) or "memory". Picked from the database
+# dialect when unset.
+SEARCH_BACKEND = None
+
+# Maximum number of results rendered on a search page
+SEARCH_RESULTS_LIMIT = 100
+
+# Page cache backend: "memory" (per worker), "redis" or None to disable it.
+# With several workers, use "redis" so that writes invalidate every worker; only
+# then does `flask import` invalidate the pages cached by the app. gunicorn
+# refuses to start more than one worker with "memory".
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+CACHE_REDIS_URL = "redis://localhost:6379/0"
+CACHE_DEFAULT_TTL = 60
+CACHE_MAX_ENTRIES = 1024
+
+# Venue and artist pages also expire when their next upcoming show starts
+CACHE_DETAIL_TTL = 24 * 60 * 60
+
+# Hours a show books its venue and artist, when scheduling shows
+SHOW_DURATION_HOURS = 3
+
+# Maximum number of shows scheduled by one batch request
+SCHEDULE_MAX_SHOWS = 1000
+
+# Seconds a form post's idempotency key is kept, so that a retry within that
+# time returns the first result; `flask purge-idempotency-keys` drops older keys
+IDEMPOTENCY_KEY_TTL = 24 * 3600
+
+# Venues and artists with more shows than this are deleted by a background
+# job, DELETE_BATCH_SIZE shows per transaction, and the request returns 202
+DELETE_INLINE_MAX_SHOWS = 10000
+DELETE_BATCH_SIZE = 5000
+
+# Background jobs are run by `flask worker`, with JOB_WORKER_PROCESSES
+# processes of JOB_WORKER_THREADS threads each. With JOB_THREADS above 0, the
+# web processes also run jobs on that many threads, which is enough when
+# developing without a worker.
+JOB_THREADS = int(os.environ.get('JOB_THREADS', 2))
+JOB_WORKER_PROCESSES = int(os.environ.get('JOB_WORKER_PROCESSES', 1))
+JOB_WORKER_THREADS = int(os.environ.get('JOB_WORKER_THREADS', 4))
+# Seconds an idle worker waits before looking for due jobs again
+JOB_POLL_INTERVAL = 1.0
+# Failed jobs are retried after JOB_RETRY_BACKOFF, then twice as long after
+# each failure up to JOB_RETRY_MAX_BACKOFF seconds, until they have run
+# JOB_MAX_ATTEMPTS times
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BACKOFF = 10
+JOB_RETRY_MAX_BACKOFF = 3600
+# Seconds a running job may go without reporting progress before it is
+# considered lost with its worker and run again
+JOB_TIMEOUT = 600
+# Finished jobs are kept this many seconds
+JOB_RETENTION = 7 * 24 * 3600
+# Jobs enqueued every given number of seconds by the workers
+JOB_SCHEDULE = {
+    'roll_counters': 300,
+    'purge_idempotency_keys': 3600,
+    'purge_jobs': 3600,
+}
+
+# Raise on lazy loads of relationships that a query did not load with options
+SQLALCHEMY_RAISELOAD = False
+
+# Time the queries of each request, reported in Server-Timing headers and logs
+SQL_INSTRUMENTATION = True
+# Statements slower than this many milliseconds are logged
+SLOW_QUERY_MS = 100
+# Most queries a request to an endpoint should run, DEFAULT_QUERY_BUDGET for
+# endpoints not listed (None for no limit). Requests over budget are logged,
+# and fail when QUERY_BUDGET_STRICT is on.
+QUERY_BUDGETS = {
+    'venues.venues': 1,
+    'venues.show_venue': 3,
+    'venues.search_venues': 3,
+    'artists.artists': 1,
+    'artists.show_artist': 3,
+    'artists.search_artists': 3,
+    'shows.shows': 1,
+    'api.venues': 3,
+    'api.venue': 3,
+    'api.artists': 3,
+    'api.artist': 3,
+    'api.shows': 2,
+    'api.show': 2,
+}
+DEFAULT_QUERY_BUDGET = None
+QUERY_BUDGET_STRICT = False
+
+# Serve Prometheus metrics on /metrics, when prometheus_client is installed
+METRICS_ENABLED = True
+
+# Default and maximum number of rows per page of the JSON API
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 500
+
+#----------------------------------------------------------------------------#
+# Environments.
+#
+# FYYUR_ENV=production or FYYUR_ENV=test applies these settings over the
+# defaults above.
+#----------------------------------------------------------------------------#
+
+class ProductionConfig:
+    DEBUG = False
+    SECRET_KEY = os.environ.get('SECRET_KEY', SECRET_KEY)
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'redis')
+    CACHE_REDIS_URL = os.environ.get('REDIS_URL', CACHE_REDIS_URL)
+    DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 30000))
+    JOB_THREADS = int(os.environ.get('JOB_THREADS', 0))
+
+class TestConfig:
+    TESTING = True
+    QUERY_BUDGET_STRICT = True
+    SQLALCHEMY_RAISELOAD = True
+    DEBUG = False
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL', "postgresql://postgres@localhost:5432/fyyur_test")
+    WTF_CSRF_ENABLED = False
+    CACHE_BACKEND = None
+    DB_POOL_SIZE = 1
+    DB_MAX_OVERFLOW = 0
@@ -0,0 +1,230 @@
+import random
+import sqlite3
+import threading
+import time
+
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from functools import wraps
+from sqlalchemy import create_engine, event, exc, orm
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
+
+#----------------------------------------------------------------------------#
+# Engine configuration.
+#
+# Pool settings come from the DB_* config values. Each gunicorn worker has
+# its own pool, so workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections
+# can be open at once. The pool records how long checkouts wait for a
+# connection, which shows when that limit is the bottleneck.
+#----------------------------------------------------------------------------#
+
+# Upper bounds in seconds of the checkout wait histogram
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float('inf'))
+
+class WaitStats:
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.count = 0
+    self.total = 0.0
+    self.max = 0.0
+    self.buckets = [0] * len(WAIT_BUCKETS)
+  
+  def observe(self, seconds):
+    with self.lock:
+      self.count += 1
+      self.total += seconds
+      self.max = max(self.max, seconds)
+      for index, bound in enumerate(WAIT_BUCKETS):
+        if seconds <= bound:
+          self.buckets[index] += 1
+          break
+  
+  def snapshot(self):
+    with self.lock:
+      return {
+        'count': self.count,
+        'total': self.total,
+        'max': self.max,
+        'buckets': {'%g' % bound: count for bound, count in zip(WAIT_BUCKETS, self.buckets)},
+      }
+
+# Queue pool timing each checkout, including the connection time when the
+# pool opens a new connection
+class TimedQueuePool(QueuePool):
+  # Functions also called with each wait, such as the observe() of a metric
+  observers = []
+  
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.wait_stats = WaitStats()
+  
+  def _do_get(self):
+    started = time.perf_counter()
+    try:
+      return super()._do_get()
+    finally:
+      waited = time.perf_counter() - started
+      self.wait_stats.observe(waited)
+      for observer in self.observers:
+        observer(waited)
+
+def engine_options(config):
+  url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+  if url.get_backend_name() != 'postgresql':
+    return {}
+  
+  options = {
+    'poolclass': TimedQueuePool,
+    'pool_size': config['DB_POOL_SIZE'],
+    'max_overflow': config['DB_MAX_OVERFLOW'],
+    'pool_timeout': config['DB_POOL_TIMEOUT'],
+    'pool_recycle': config['DB_POOL_RECYCLE'],
+    'pool_pre_ping': config['DB_POOL_PRE_PING'],
+  }
+  # PgBouncer rejects startup options in transaction pooling mode, the
+  # timeout is then set for each transaction instead
+  if config['DB_STATEMENT_TIMEOUT'] and config['DB_TRANSACTION_POOLING']:
+    options['execution_options'] = {'statement_timeout': config['DB_STATEMENT_TIMEOUT']}
+  elif config['DB_STATEMENT_TIMEOUT']:
+    options['connect_args'] = {'options': '-c statement_timeout=%d' % config['DB_STATEMENT_TIMEOUT']}
+  return options
+
+# Apply the statement_timeout execution option of a connection, if any, to
+# each of its transactions. Migrations set it to 0.
+def set_local_statement_timeout(connection):
+  timeout = connection.get_execution_options().get('statement_timeout')
+  if timeout is not None and connection.dialect.name == 'postgresql':
+    connection.exec_driver_sql('SET LOCAL statement_timeout = %d' % timeout)
+
+# INSERT of the connection's dialect, for its ON CONFLICT clauses
+def insert_statement(connection, table):
+  if connection.dialect.name == 'postgresql':
+    from sqlalchemy.dialects.postgresql import insert
+  else:
+    from sqlalchemy.dialects.sqlite import insert
+  return insert(table)
+
+# SQLite only enforces foreign keys, and their ON DELETE CASCADE, when asked to
+@event.listens_for(Engine, 'connect')
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+  if isinstance(dbapi_connection, sqlite3.Connection):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
+#----------------------------------------------------------------------------#
+# Read replicas.
+#
+# Views marked read_only run their queries on a replica, picked once per
+# request among those less than REPLICA_MAX_LAG seconds behind the primary,
+# and on the primary when none is. A client that sent a write stays on the
+# primary for REPLICA_PIN_SECONDS, so the page it is redirected to shows
+# its change.
+#----------------------------------------------------------------------------#
+
+# Seconds of replay lag, 0 when the replica has replayed everything it received
+LAG_QUERY = '''
+  SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+              ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END
+'''
+
+PIN_KEY = 'primary_until'
+
+class ReplicaRouter:
+  def __init__(self, app):
+    self.engines = []
+    for url in app.config['SQLALCHEMY_REPLICA_URIS']:
+      options = engine_options(dict(app.config, SQLALCHEMY_DATABASE_URI=url))
+      self.engines.append(create_engine(url, **options))
+    self.max_lag = app.config['REPLICA_MAX_LAG']
+    self.check_interval = app.config['REPLICA_LAG_CHECK_INTERVAL']
+    self.lags = {}
+  
+  # Lag of a replica in seconds, measured at most every check_interval
+  # seconds. Unreachable replicas count as infinitely late.
+  def lag(self, engine):
+    checked_at, lag = self.lags.get(engine, (None, None))
+    if checked_at is None or time.monotonic() - checked_at > self.check_interval:
+      try:
+        with engine.connect() as connection:
+          lag = connection.exec_driver_sql(LAG_QUERY).scalar() if engine.dialect.name == 'postgresql' else 0
+        lag = float(lag or 0)
+      except exc.DBAPIError:
+        lag = float('inf')
+      self.lags[engine] = (time.monotonic(), lag)
+    return lag
+  
+  def choose(self):
+    engines = [engine for engine in self.engines if self.lag(engine) <= self.max_lag]
+    return random.choice(engines) if engines else None
+  
+  def stats(self):
+    return [dict(pool_stats(engine), url=engine.url.render_as_string(hide_password=True), lag=self.lag(engine))
+            for engine in self.engines]
+
+def pinned_to_primary():
+  return session.get(PIN_KEY, 0) > time.time()
+
+# Run the queries of a view on a replica
+def read_only(view):
+  @wraps(view)
+  def wrapper(*args, **kwargs):
+    g.read_replica = not pinned_to_primary()
+    return view(*args, **kwargs)
+  wrapper.read_only = True
+  return wrapper
+
+class RoutingSession(SignallingSession):
+  def get_bind(self, mapper=None, clause=None):
+    if not self._flushing and has_request_context() and g.get('read_replica'):
+      if 'replica' not in g:
+        router = self.app.extensions.get('replicas')
+        g.replica = router.choose() if router is not None else None
+      if g.replica is not None:
+        return g.replica
+    return super().get_bind(mapper, clause)
+
+class RoutingSQLAlchemy(SQLAlchemy):
+  def create_session(self, options):
+    return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+#----------------------------------------------------------------------------#
+# Lazy loads.
+#
+# With SQLALCHEMY_RAISELOAD, ORM queries default to raiseload('*'): touching
+# a relationship that the query did not load raises instead of running one
+# more query per instance. Views load what they render with selectinload()
+# or joinedload() options, which take precedence over the default.
+#----------------------------------------------------------------------------#
+
+def raise_on_lazy_load(state):
+  if state.is_select and not state.is_relationship_load and not state.is_column_load:
+    state.statement = state.statement.options(orm.raiseload('*'))
+
+def init_app(app):
+  app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+  if not event.contains(Engine, 'begin', set_local_statement_timeout):
+    event.listen(Engine, 'begin', set_local_statement_timeout)
+  if app.config['SQLALCHEMY_RAISELOAD'] and not event.contains(RoutingSession, 'do_orm_execute', raise_on_lazy_load):
+    event.listen(RoutingSession, 'do_orm_execute', raise_on_lazy_load)
+  
+  if app.config['SQLALCHEMY_REPLICA_URIS']:
+    app.extensions['replicas'] = ReplicaRouter(app)
+    
+    @app.before_request
+    def pin_writes():
+      view = app.view_functions.get(request.endpoint)
+      if request.method not in ('GET', 'HEAD', 'OPTIONS') and not getattr(view, 'read_only', False):
+        session[PIN_KEY] = time.time() + app.config['REPLICA_PIN_SECONDS']
+
+# Pool state and checkout waits of an engine
+def pool_stats(engine):
+  pool = engine.pool
+  stats = {'pool': type(pool).__name__}
+  if isinstance(pool, QueuePool):
+    stats.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow(),
+                 idle=pool.checkedin())
+  if isinstance(pool, TimedQueuePool):
+    stats['wait'] = pool.wait_stats.snapshot()
+  return stats
@@ -0,0 +1,102 @@
+import re
+
+from cache import cache
+from models import Artist, Show, Venue, db
+
+#----------------------------------------------------------------------------#
+# Query plan check.
+#
+# The main pages are rendered with the test client while their queries on
+# Show are recorded, then each query is explained with sequential scans
+# disabled: a plan that still scans Show sequentially has no usable index.
+# Small development tables would otherwise be scanned by choice.
+#----------------------------------------------------------------------------#
+
+# Pages checked, formatted with the venue and artist having the most shows
+PAGES = [
+  '/venues',
+  '/artists',
+  '/shows',
+  '/venues/{venue_id}',
+  '/artists/{artist_id}',
+]
+
+SQLITE_SCAN = re.compile(r'^SCAN (TABLE )?"?Show"?( AS \w+)?$')
+
+def busiest(model):
+  return db.session.query(model.id) \
+    .order_by((model.upcoming_shows_count + model.past_shows_count).desc(), model.id) \
+    .limit(1).scalar() or 1
+
+def record_queries(app, paths):
+  queries = []
+  
+  def record(connection, cursor, statement, parameters, context, executemany):
+    if statement.lstrip().upper().startswith('SELECT') and '"Show"' in statement:
+      queries.append((path, statement, parameters))
+  
+  db.event.listen(db.engine, 'before_cursor_execute', record)
+  try:
+    with cache.disabled():
+      client = app.test_client()
+      for path in paths:
+        client.get(path)
+  finally:
+    db.event.remove(db.engine, 'before_cursor_execute', record)
+  return queries
+
+def postgres_seq_scans(plan):
+  scans = []
+  if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name') == 'Show':
+    scans.append('Seq Scan on Show')
+  for child in plan.get('Plans', []):
+    scans.extend(postgres_seq_scans(child))
+  return scans
+
+def explain(connection, statement, parameters):
+  if connection.dialect.name == 'postgresql':
+    connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    plan = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + statement, parameters).scalar()
+    return postgres_seq_scans(plan[0]['Plan'])
+  rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)
+  return [row[-1] for row in rows if SQLITE_SCAN.match(row[-1])]
+
+# Requests of `flask check-queries` besides the pages, as (method, path, form)
+REQUESTS = [
+  ('POST', '/venues/search', {'search_term': 'an'}),
+  ('POST', '/artists/search', {'search_term': 'an'}),
+  ('GET', '/api/v1/venues', None),
+  ('GET', '/api/v1/venues/{venue_id}', None),
+  ('GET', '/api/v1/artists', None),
+  ('GET', '/api/v1/artists/{artist_id}', None),
+  ('GET', '/api/v1/shows', None),
+  ('GET', '/api/v1/shows/{show_id}', None),
+]
+
+def ids():
+  return {'venue_id': busiest(Venue), 'artist_id': busiest(Artist),
+          'show_id': db.session.query(db.func.min(Show.id)).scalar() or 1}
+
+# Paths of the checked pages
+def page_paths():
+  return [page.format(**ids()) for page in PAGES]
+
+# Requests of the pages and of REQUESTS, with their ids filled in
+def budgeted_requests():
+  values = ids()
+  return [('GET', path, None) for path in page_paths()] + \
+         [(method, path.format(**values), form) for method, path, form in REQUESTS]
+
+# Queries of the main pages that scan Show sequentially, as
+# (path, statement, scans) tuples, along with the number of queries checked
+
+def check_views(app):
+  queries = record_queries(app, page_paths())
+  failures = []
+  for path, statement, parameters in queries:
+    with db.engine.connect() as connection:
+      with connection.begin():
+        scans = explain(connection, statement, parameters)
+    if scans:
+      failures.append((path, statement, scans))
+  return failures, len(queries)
@@ -0,0 +1,88 @@
+import csv
+import io
+import zlib
+
+from api import FIELDS, dumps, serialize
+from models import Artist, Show, Venue, db
+
+#----------------------------------------------------------------------------#
+# Bulk export.
+#
+# Rows are read with a server-side cursor (yield_per) and serialized one
+# chunk at a time, so memory use does not grow with the size of the tables.
+# The output is a generator of byte chunks, streamed as is by the views and
+# written to a file by the export command.
+#----------------------------------------------------------------------------#
+
+MODELS = {'venues': Venue, 'artists': Artist, 'shows': Show}
+
+# Rows fetched from the cursor at a time
+CHUNK_SIZE = 1000
+
+# Bytes buffered before a chunk of output is yielded
+BUFFER_SIZE = 64 * 1024
+
+# Shows starting in [start, end), or venues and artists with such a show
+def export_query(model, start=None, end=None):
+  columns = [getattr(model, field) for field in FIELDS[model] if field != 'genres']
+  query = db.session.query(*columns)
+  if model is Show:
+    condition = db.true()
+  else:
+    condition = getattr(Show, model.__tablename__.lower() + '_id') == model.id
+  if start is not None:
+    condition = db.and_(condition, Show.start_time >= start)
+  if end is not None:
+    condition = db.and_(condition, Show.start_time < end)
+  if model is Show:
+    query = query.filter(condition)
+  elif start is not None or end is not None:
+    query = query.filter(db.exists().where(condition))
+  return query.order_by(model.id).yield_per(CHUNK_SIZE)
+
+def export_rows(model, start=None, end=None):
+  chunk = []
+  for row in export_query(model, start, end):
+    chunk.append(row)
+    if len(chunk) == CHUNK_SIZE:
+      yield from serialize(model, chunk, FIELDS[model])
+      chunk = []
+  if chunk:
+    yield from serialize(model, chunk, FIELDS[model])
+
+def csv_lines(model, rows):
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  writer.writerow(FIELDS[model])
+  for row in rows:
+    if 'genres' in row:
+      row['genres'] = ','.join(row['genres'])
+    writer.writerow([row[field] for field in FIELDS[model]])
+    yield buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+
+def jsonl_lines(model, rows):
+  for row in rows:
+    yield dumps(row) + b'\n'
+
+def export(kind, format, start=None, end=None):
+  model = MODELS[kind]
+  lines = (csv_lines if format == 'csv' else jsonl_lines)(model, export_rows(model, start, end))
+  buffer, size = [], 0
+  for line in lines:
+    buffer.append(line)
+    size += len(line)
+    if size >= BUFFER_SIZE:
+      yield b''.join(buffer)
+      buffer, size = [], 0
+  if buffer:
+    yield b''.join(buffer)
+
+def gzip_chunks(chunks):
+  compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+  for chunk in chunks:
+    data = compressor.compress(chunk)
+    if data:
+      yield data
+  yield compressor.flush()
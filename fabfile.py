@@ -1,18 +1,40 @@
-from fabric.api import local, settings, abort
+from fabric.api import local, settings, shell_env, abort
 from fabric.contrib.console import confirm
 
 # prepare for deployment
 
 
+# run every benchmark once, as a smoke test of the app and its query helpers,
+# then fill the test database (TEST_DATABASE_URL, dropped first) with
+# synthetic data and check the queries of the main pages against it, with
+# the test config: query budgets are strict and lazy loads raise
 def test():
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python -m pytest benchmarks --benchmark-disable -q", capture=True
         )
+        if not result.failed:
+            result = check_queries()
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
 
 
+def check_queries():
+    from config import TestConfig
+    url = TestConfig.SQLALCHEMY_DATABASE_URI
+    result = local(
+        "python benchmarks/datagen.py --database-url '{}' --drop "
+        "--venues 200 --artists 400 --shows 20000".format(url)
+    )
+    if result.failed:
+        return result
+    with shell_env(FYYUR_ENV="test", FLASK_APP="app.py", JOB_THREADS="0"):
+        result = local("flask check-queries")
+        if not result.failed:
+            result = local("flask explain-views")
+    return result
+
+
 def commit():
     message = raw_input("Enter a git commit message: ")
     local("git add . && git commit -am '{}'".format(message))
@@ -40,7 +62,7 @@ def heroku():
 
 def heroku_test():
     local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
+        "heroku run python -m pytest benchmarks --benchmark-disable -q"
     )
 
 
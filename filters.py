@@ -0,0 +1,37 @@
+from datetime import datetime, timezone
+from functools import lru_cache
+
+#----------------------------------------------------------------------------#
+# Filters.
+#
+# babel and dateutil are imported on first use, after the workers start.
+#----------------------------------------------------------------------------#
+
+FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+# Parsed CLDR patterns and locales, shared by every call
+@lru_cache(maxsize=None)
+def get_pattern(format):
+  import babel.dates
+  return babel.dates.parse_pattern(FORMATS.get(format, format))
+
+@lru_cache(maxsize=None)
+def get_locale(locale):
+  import babel
+  return babel.Locale.parse(locale)
+
+# Format a datetime, or a string holding one, with a named or CLDR pattern.
+# Results are memoized per timestamp, as the same show times are rendered
+# over and over.
+@lru_cache(maxsize=8192)
+def format_datetime(value, format='medium', locale='en'):
+  if not isinstance(value, datetime):
+    import dateutil.parser
+    value = dateutil.parser.parse(value)
+  # Naive values are taken as UTC and left as is, like babel.dates.format_datetime does
+  if value.tzinfo is None:
+    value = value.replace(tzinfo=timezone.utc)
+  return get_pattern(format).apply(value, get_locale(locale))
@@ -0,0 +1,45 @@
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+
+# Build the app once in the master process and fork the workers from it, so
+# that imports and create_app() are not repeated in every worker. create_app()
+# opens no database connection, so the workers do not share any.
+wsgi_app = 'app:create_app()'
+preload_app = True
+
+# Deployments get the production settings unless told otherwise
+os.environ.setdefault('FYYUR_ENV', 'production')
+
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+
+# Every worker writes its metrics to this directory, and /metrics sums them.
+# It must be set before prometheus_client is imported, hence here.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'fyyur-metrics'))
+
+# The memory page cache is per worker: an edit only drops the pages cached by
+# the worker handling it, and the others serve theirs until they expire
+def check_cache_backend(server):
+  app = server.app.wsgi()
+  if server.cfg.workers > 1 and app.config.get('CACHE_BACKEND') == 'memory':
+    server.log.error('The memory page cache is per worker, set CACHE_BACKEND=redis to run %d workers',
+                     server.cfg.workers)
+    sys.exit(1)
+
+# Start from an empty directory, so that samples of a previous run are not counted
+def on_starting(server):
+  check_cache_backend(server)
+  path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+  shutil.rmtree(path, ignore_errors=True)
+  os.makedirs(path)
+
+# Drop the gauges of dead workers; their counters and histograms are kept
+def child_exit(server, worker):
+  try:
+    from prometheus_client import multiprocess
+  except ImportError:
+    return
+  multiprocess.mark_process_dead(worker.pid)
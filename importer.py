@@ -0,0 +1,267 @@
+import csv
+import json
+import os
+import time
+
+from bisect import insort
+from database import insert_statement
+from datetime import datetime, timedelta
+from flask import current_app
+from forms import ArtistForm, ShowForm, VenueForm
+from itertools import count
+from models import Artist, Genre, Show, Venue, artist_genres, db, refresh_show_counters, venue_genres
+from werkzeug.datastructures import MultiDict
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#
+# Rows are streamed from CSV or JSON Lines files, validated with the same
+# forms as the web views and written in batches: venues and artists are
+# upserted on their (name, city, state) key with one executemany per batch,
+# shows are inserted once their venue and artist are resolved, unless they
+# overlap another show of either, which also rejects the shows of an export
+# imported again. A checkpoint file records the last committed line so that
+# a failed run can resume.
+#----------------------------------------------------------------------------#
+
+FORMS = {'venues': VenueForm, 'artists': ArtistForm, 'shows': ShowForm}
+MODELS = {'venues': Venue, 'artists': Artist}
+GENRES = {Venue: venue_genres, Artist: artist_genres}
+
+# Form fields stored under another column name
+COLUMNS = {'website_link': 'website'}
+FIELDS = {column: field for field, column in COLUMNS.items()}
+
+# Values read as unchecked boolean fields, as written by exports
+BOOLEANS = ('seeking_talent', 'seeking_venue')
+FALSE_VALUES = ('false', 'no', 'n', '0')
+
+# Timestamps, which JSON Lines exports write in ISO 8601
+DATETIMES = ('start_time',)
+FORM_DATETIME = '%Y-%m-%d %H:%M:%S'
+
+def read_rows(path, format):
+  with open(path, newline='') as file:
+    if format == 'csv':
+      for line, row in enumerate(csv.DictReader(file), start=1):
+        yield line, row
+    else:
+      for line, text in enumerate(file, start=1):
+        if text.strip():
+          yield line, json.loads(text)
+
+# A timestamp in the format of the forms' DateTimeField
+def form_datetime(value):
+  try:
+    return datetime.fromisoformat(str(value)).strftime(FORM_DATETIME)
+  except ValueError:
+    return value
+
+def as_formdata(row):
+  formdata = MultiDict()
+  for key, value in row.items():
+    if value is None or value == '':
+      continue
+    if key in BOOLEANS and str(value).lower() in FALSE_VALUES:
+      continue
+    key = FIELDS.get(key, key)
+    if key in DATETIMES:
+      value = form_datetime(value)
+    if key == 'genres' and isinstance(value, str):
+      value = [genre.strip() for genre in value.split(',') if genre.strip()]
+    if isinstance(value, bool):
+      value = 'y' if value else ''
+    if isinstance(value, list):
+      formdata.setlist(key, [str(item) for item in value])
+    else:
+      formdata.add(key, str(value))
+  return formdata
+
+# Validate a row with the form of its kind. Returns the cleaned data, or None
+# and the form errors.
+def validate(kind, row):
+  form = FORMS[kind](formdata=as_formdata(row), meta={'csrf': False})
+  if not form.validate():
+    return None, form.errors
+  data = {COLUMNS.get(key, key): value for key, value in form.data.items()}
+  if kind == 'shows':
+    for side in ('venue', 'artist'):
+      data[side] = (row.get(side + '_name'), row.get(side + '_city'), row.get(side + '_state'))
+  return data, None
+
+# Insert or update venues or artists on their (name, city, state) key, then
+# replace their genres. Like write_shows, returns the number of rows written,
+# the rejected lines and the cache tags of the pages showing them.
+def write_entities(connection, model, batch):
+  table = model.__table__
+  # The last row wins when a key repeats within a batch
+  batch = list({(data['name'], data['city'], data['state']): data for data in batch}.values())
+  columns = [column for column in batch[0] if column not in ('genres', 'line')]
+  rows = [{column: data.get(column) for column in columns} for data in batch]
+  
+  statement = insert_statement(connection, table)
+  statement = statement.on_conflict_do_update(
+    index_elements=['name', 'city', 'state'],
+    set_=dict({column: statement.excluded[column] for column in columns if column not in ('name', 'city', 'state')},
+              version=table.c.version + 1))
+  connection.execute(statement, rows)
+  
+  keys = {(data['name'], data['city'], data['state']) for data in batch}
+  ids = dict(((name, city, state), id) for id, name, city, state in connection.execute(
+    db.select([table.c.id, table.c.name, table.c.city, table.c.state])
+    .where(db.tuple_(table.c.name, table.c.city, table.c.state).in_(list(keys)))))
+  
+  names = {name for data in batch for name in data['genres']}
+  connection.execute(insert_statement(connection, Genre.__table__).on_conflict_do_nothing(index_elements=['name']),
+                     [{'name': name} for name in names])
+  genre_ids = dict((name, id) for id, name in connection.execute(
+    db.select([Genre.__table__.c.id, Genre.__table__.c.name]).where(Genre.__table__.c.name.in_(names))))
+  
+  association = GENRES[model]
+  key = association.c[model.__tablename__.lower() + '_id']
+  connection.execute(association.delete().where(key.in_(list(ids.values()))))
+  links = {(ids[(data['name'], data['city'], data['state'])], genre_ids[name])
+           for data in batch for name in data['genres']}
+  connection.execute(association.insert(), [{key.name: id, 'genre_id': genre_id} for id, genre_id in links])
+  return len(rows), [], ['%s:%d' % (model.__tablename__.lower(), id) for id in ids.values()]
+
+# Resolve the (name, city, state) keys of shows without ids
+def resolve_ids(connection, model, keys):
+  if not keys:
+    return {}
+  table = model.__table__
+  return dict(((name, city, state), id) for id, name, city, state in connection.execute(
+    db.select([table.c.id, table.c.name, table.c.city, table.c.state])
+    .where(db.tuple_(table.c.name, table.c.city, table.c.state).in_(list(keys)))))
+
+# Why a show cannot be booked, from its conflicts: already imported when a
+# show of the same venue and artist starts at the same time
+def conflict_errors(start_time, conflicts):
+  sides = {}
+  for side, conflict in conflicts:
+    if 'show_id' in conflict and conflict['start_time'] == start_time:
+      sides.setdefault(conflict['show_id'], set()).add(side)
+  if any(len(found) == 2 for found in sides.values()):
+    return {'show': ['Already imported']}
+  return {'show': ['Overlaps %s of the %s' % ('show %d' % conflict['show_id'] if 'show_id' in conflict
+                                               else 'line %d' % conflict['line'], side)
+                   for side, conflict in conflicts]}
+
+# Insert shows once their venue and artist are resolved, and when they do not
+# overlap another show of either, existing or accepted earlier in the import,
+# under the same rules as scheduling
+def write_shows(connection, batch):
+  from scheduling import SIDES, find_conflicts, get_bookings, lock_ids
+  
+  ids = {}
+  for side, model in SIDES:
+    keys = {data[side] for data in batch if not data[side + '_id'] and all(data[side])}
+    ids[side] = resolve_ids(connection, model, keys)
+    given = {int(data[side + '_id']) for data in batch if data[side + '_id'] and data[side + '_id'].isdigit()}
+    ids[side + 's'] = lock_ids(connection, model, given | set(ids[side].values()))
+  
+  candidates, rejected = [], []
+  for data in batch:
+    row = {'start_time': data['start_time']}
+    for side, _ in SIDES:
+      id = data[side + '_id']
+      if id:
+        row[side + '_id'] = int(id) if id.isdigit() else None
+      else:
+        row[side + '_id'] = ids[side].get(data[side])
+      if row[side + '_id'] not in ids[side + 's']:
+        row[side + '_id'] = None
+    if row['venue_id'] is None or row['artist_id'] is None:
+      rejected.append((data['line'], {'show': ['Unknown venue or artist']}))
+    else:
+      candidates.append((data['line'], row))
+  
+  rows = []
+  if candidates:
+    duration = timedelta(hours=current_app.config['SHOW_DURATION_HOURS'])
+    start = min(row['start_time'] for _, row in candidates) - duration
+    end = max(row['start_time'] for _, row in candidates) + duration
+    sequence, bookings = count(), {}
+    for side, _ in SIDES:
+      bookings[side] = get_bookings(connection, side, {row[side + '_id'] for _, row in candidates}, start, end, sequence)
+    
+    for line, row in candidates:
+      conflicts = [(side, conflict) for side, _ in SIDES
+                   for conflict in find_conflicts(bookings[side][row[side + '_id']], row['start_time'], duration)]
+      if conflicts:
+        rejected.append((line, conflict_errors(row['start_time'], conflicts)))
+        continue
+      for side, _ in SIDES:
+        insort(bookings[side][row[side + '_id']], (row['start_time'], next(sequence), {'line': line}))
+      rows.append(row)
+  
+  tags = []
+  if rows:
+    connection.execute(Show.__table__.insert(), rows)
+    for model in (Venue, Artist):
+      kind = model.__tablename__.lower()
+      ids = {row[kind + '_id'] for row in rows}
+      refresh_show_counters(connection, model, ids)
+      tags += ['%s:%d' % (kind, id) for id in ids]
+  return len(rows), rejected, tags
+
+def read_checkpoint(checkpoint, path):
+  if checkpoint and os.path.exists(checkpoint):
+    with open(checkpoint) as file:
+      state = json.load(file)
+    if state.get('path') == os.path.abspath(path):
+      return state['line']
+  return 0
+
+def write_checkpoint(checkpoint, path, line):
+  if checkpoint:
+    with open(checkpoint + '.tmp', 'w') as file:
+      json.dump({'path': os.path.abspath(path), 'line': line}, file)
+    os.replace(checkpoint + '.tmp', checkpoint)
+
+def run_import(kind, path, format=None, batch_size=1000, checkpoint=None, echo=print):
+  format = format or ('csv' if path.endswith('.csv') else 'jsonl')
+  start_line = read_checkpoint(checkpoint, path)
+  if start_line:
+    echo('Resuming %s after line %d' % (path, start_line))
+  
+  stats = {'written': 0, 'rejected': 0, 'tags': set()}
+  started = time.perf_counter()
+  
+  def flush(batch, last_line):
+    with db.engine.begin() as connection:
+      if kind == 'shows':
+        written, rejected, tags = write_shows(connection, batch)
+      else:
+        written, rejected, tags = write_entities(connection, MODELS[kind], batch)
+    write_checkpoint(checkpoint, path, last_line)
+    stats['written'] += written
+    stats['rejected'] += len(rejected)
+    stats['tags'].update(tags)
+    for line, errors in rejected:
+      echo('line %d: %s' % (line, errors))
+    elapsed = time.perf_counter() - started
+    echo('%d rows written, %d rejected, %.0f rows/sec' % (stats['written'], stats['rejected'], stats['written'] / elapsed))
+  
+  batch, last_line = [], start_line
+  for line, row in read_rows(path, format):
+    if line <= start_line:
+      continue
+    last_line = line
+    data, errors = validate(kind, row)
+    if errors:
+      stats['rejected'] += 1
+      echo('line %d: %s' % (line, errors))
+      continue
+    data['line'] = line
+    batch.append(data)
+    if len(batch) == batch_size:
+      flush(batch, last_line)
+      batch = []
+  if batch:
+    flush(batch, last_line)
+  else:
+    write_checkpoint(checkpoint, path, last_line)
+  
+  stats['elapsed'] = time.perf_counter() - started
+  return stats
@@ -0,0 +1,135 @@
+import heapq
+import json
+import logging
+import time
+
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Query instrumentation.
+#
+# Every statement run during a request is timed from the cursor events of
+# all engines. Responses carry the query count and database time in a
+# Server-Timing header, each request is logged as one JSON line to the
+# fyyur.requests logger, and statements slower than SLOW_QUERY_MS are logged
+# on their own. Endpoints
+# running more queries than their budget in QUERY_BUDGETS are logged, or
+# fail with QUERY_BUDGET_STRICT on, so that N+1 patterns break the tests.
+# Statements run within outside_budget(), such as the rebuild of a cache
+# that the next requests will share, are reported but not held against it.
+#----------------------------------------------------------------------------#
+
+# Slowest statements kept per request
+SLOWEST_QUERIES = 5
+
+logger = logging.getLogger('fyyur.requests')
+
+class QueryBudgetExceeded(Exception):
+  pass
+
+class QueryStats:
+  def __init__(self):
+    self.count = 0
+    self.outside_budget = 0
+    self.duration = 0.0
+    self.slowest = []
+  
+  def record(self, statement, duration):
+    self.count += 1
+    self.outside_budget += g.get('outside_budget', False)
+    self.duration += duration
+    entry = (duration, self.count, statement)
+    if len(self.slowest) < SLOWEST_QUERIES:
+      heapq.heappush(self.slowest, entry)
+    else:
+      heapq.heappushpop(self.slowest, entry)
+  
+  def slowest_statements(self):
+    return [{'ms': round(duration * 1000, 2), 'statement': ' '.join(statement.split())[:500]}
+            for duration, _, statement in sorted(self.slowest, reverse=True)]
+
+def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+  connection.info.setdefault('query_started', []).append(time.perf_counter())
+
+def after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+  duration = time.perf_counter() - connection.info['query_started'].pop()
+  if not has_request_context() or 'query_stats' not in g:
+    return
+  g.query_stats.record(statement, duration)
+  if duration * 1000 > current_app.config['SLOW_QUERY_MS']:
+    logger.warning(json.dumps({
+      'event': 'slow_query',
+      'endpoint': request.endpoint,
+      'ms': round(duration * 1000, 2),
+      'statement': ' '.join(statement.split())[:2000],
+    }))
+
+# Statements of the block do not count against the request's query budget
+@contextmanager
+def outside_budget():
+  if not has_request_context():
+    yield
+    return
+  outer, g.outside_budget = g.get('outside_budget', False), True
+  try:
+    yield
+  finally:
+    g.outside_budget = outer
+
+def query_budget(endpoint):
+  return current_app.config['QUERY_BUDGETS'].get(endpoint, current_app.config['DEFAULT_QUERY_BUDGET'])
+
+# Number of queries of a response held against its budget, from its
+# Server-Timing header
+def query_count(response):
+  for timing in response.headers.getlist('Server-Timing'):
+    if timing.startswith('db;'):
+      words = timing.split('desc="')[1].split()
+      return int(words[0]) - (int(words[2]) if len(words) > 2 else 0)
+  return None
+
+def start_request():
+  g.query_stats = QueryStats()
+  g.request_started = time.perf_counter()
+
+def finish_request(response):
+  stats = g.get('query_stats')
+  if stats is None:
+    return response
+  elapsed = time.perf_counter() - g.request_started
+  description = '%d queries' % stats.count
+  if stats.outside_budget:
+    description += ', %d outside the budget' % stats.outside_budget
+  response.headers.add('Server-Timing', 'db;dur=%.1f;desc="%s"' % (stats.duration * 1000, description))
+  response.headers.add('Server-Timing', 'app;dur=%.1f' % (elapsed * 1000))
+  
+  budget = query_budget(request.endpoint)
+  over_budget = budget is not None and stats.count - stats.outside_budget > budget
+  logger.log(logging.WARNING if over_budget else logging.INFO, json.dumps({
+    'event': 'request',
+    'method': request.method,
+    'endpoint': request.endpoint,
+    'path': request.path,
+    'status': response.status_code,
+    'ms': round(elapsed * 1000, 2),
+    'queries': stats.count,
+    'queries_outside_budget': stats.outside_budget,
+    'db_ms': round(stats.duration * 1000, 2),
+    'query_budget': budget,
+    'slowest': stats.slowest_statements(),
+  }))
+  if over_budget and current_app.config['QUERY_BUDGET_STRICT']:
+    raise QueryBudgetExceeded('%s ran %d queries, its budget is %d' % (request.endpoint, stats.count - stats.outside_budget, budget))
+  return response
+
+def init_app(app):
+  if not app.config['SQL_INSTRUMENTATION']:
+    return
+  if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+    event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+  app.before_request(start_request)
+  app.after_request(finish_request)
@@ -0,0 +1,273 @@
+import importlib
+import random
+import signal
+import threading
+import time
+import traceback
+
+from database import insert_statement
+from datetime import datetime, timedelta
+from flask import current_app
+from models import Job, db
+
+#----------------------------------------------------------------------------#
+# Background jobs.
+#
+# Work too slow for a request, such as deleting a venue with a long history,
+# is recorded as a Job row and run by `flask worker`, or by a few threads of
+# the web processes when JOB_THREADS is set. Workers claim due jobs with
+# SELECT ... FOR UPDATE SKIP LOCKED, so that any number of them share the
+# queue without a broker and without waiting on each other's locks.
+#
+# A failed job is queued again with an exponential backoff until it has run
+# max_attempts times. A running job holds a lease, renewed whenever it
+# reports its progress; when its worker dies, the lease runs out and another
+# worker runs the job again. Handlers are therefore written to be run more
+# than once.
+#----------------------------------------------------------------------------#
+
+# Function running each kind of job, imported on first use. It is called
+# with the job's arguments and a report(done, total) callback, and returns
+# the job's result.
+HANDLERS = {
+  'delete': 'writes:delete_in_batches',
+  'roll_counters': 'jobs:roll_counters',
+  'purge_idempotency_keys': 'jobs:purge_idempotency_keys',
+  'purge_jobs': 'jobs:purge_jobs',
+}
+
+def get_handler(kind):
+  module, name = HANDLERS[kind].split(':')
+  return getattr(importlib.import_module(module), name)
+
+#  Queue
+#  ----------------------------------------------------------------
+
+# Queue HANDLERS[kind](**args) to run in `delay` seconds. A job with the key
+# of another one that has not failed is not queued. Returns the id of the job.
+def enqueue(kind, args, key=None, delay=0, max_attempts=None):
+  table = Job.__table__
+  now = datetime.utcnow()
+  statement = insert_statement(db.engine, table).values(
+    kind=kind, args=args, key=key, status='queued', attempts=0,
+    max_attempts=max_attempts or current_app.config['JOB_MAX_ATTEMPTS'],
+    run_at=now + timedelta(seconds=delay), created_at=now).on_conflict_do_nothing(index_elements=['key'])
+  id = None
+  while id is None:
+    with db.engine.begin() as connection:
+      result = connection.execute(statement)
+      if result.rowcount:
+        id = result.inserted_primary_key[0]
+      else:
+        # None when the job holding the key failed in the meantime
+        id = connection.execute(db.select([table.c.id]).where(table.c.key == key)).scalar()
+  
+  if current_app.config['JOB_THREADS'] or 'jobs' in current_app.extensions:
+    local_worker(current_app._get_current_object()).wake()
+  return id
+
+# Jobs a worker can take: queued ones that are due, and running ones whose
+# worker let the lease run out
+def due(table, now):
+  return db.or_(db.and_(table.c.status == 'queued', table.c.run_at <= now),
+                db.and_(table.c.status == 'running', table.c.locked_until < now,
+                        table.c.attempts < table.c.max_attempts))
+
+def lease(now):
+  return now + timedelta(seconds=current_app.config['JOB_TIMEOUT'])
+
+# Take the next due job, or None when there is none. On Postgres, the row
+# lock of the SELECT keeps other workers off the job; elsewhere, the UPDATE
+# only takes the job if no other worker took it first.
+def claim(connection):
+  table = Job.__table__
+  now = datetime.utcnow()
+  id = connection.execute(db.select([table.c.id])
+                          .where(due(table, now))
+                          .order_by(table.c.run_at, table.c.id)
+                          .limit(1)
+                          .with_for_update(skip_locked=True)).scalar()
+  if id is None:
+    return None
+  
+  claimed = connection.execute(table.update()
+                               .where(table.c.id == id)
+                               .where(due(table, now))
+                               .values(status='running', attempts=table.c.attempts + 1,
+                                       started_at=now, locked_until=lease(now))).rowcount
+  if not claimed:
+    return None
+  return connection.execute(db.select([table.c.id, table.c.kind, table.c.args, table.c.attempts, table.c.max_attempts])
+                            .where(table.c.id == id)).first()
+
+# Seconds before retrying a job that failed for the n-th time, jittered so
+# that jobs failing together are not all retried together
+def backoff(attempts):
+  config = current_app.config
+  delay = min(config['JOB_RETRY_BACKOFF'] * 2 ** (attempts - 1), config['JOB_RETRY_MAX_BACKOFF'])
+  return delay * random.uniform(0.5, 1.0)
+
+def update_job(id, **values):
+  table = Job.__table__
+  with db.engine.begin() as connection:
+    connection.execute(table.update().where(table.c.id == id).values(**values))
+
+# Run a claimed job and record its outcome
+def run(job):
+  def report(done, total):
+    update_job(job.id, done=done, total=total, locked_until=lease(datetime.utcnow()))
+  
+  try:
+    result = get_handler(job.kind)(report=report, **job.args)
+  except Exception:
+    current_app.logger.exception('Job %d (%s) failed, attempt %d of %d', job.id, job.kind, job.attempts, job.max_attempts)
+    error = traceback.format_exc(limit=-3)
+    if job.attempts < job.max_attempts:
+      update_job(job.id, status='queued', error=error, locked_until=None,
+                 run_at=datetime.utcnow() + timedelta(seconds=backoff(job.attempts)))
+    else:
+      update_job(job.id, status='failed', error=error, key=None, locked_until=None, finished_at=datetime.utcnow())
+  else:
+    update_job(job.id, status='done', result=result, error=None, locked_until=None, finished_at=datetime.utcnow())
+  finally:
+    db.session.remove()
+
+# Claim and run the next due job. Returns whether there was one.
+def run_next():
+  with db.engine.begin() as connection:
+    job = claim(connection)
+  if job is None:
+    return False
+  run(job)
+  return True
+
+def get_job(id):
+  table = Job.__table__
+  row = db.session.execute(db.select([table]).where(table.c.id == id)).first()
+  return dict(row._mapping) if row is not None else None
+
+# Latest jobs, of the given status and kind if any
+def list_jobs(status=None, kind=None, limit=50):
+  table = Job.__table__
+  query = db.select([table]).order_by(table.c.id.desc()).limit(limit)
+  if status:
+    query = query.where(table.c.status == status)
+  if kind:
+    query = query.where(table.c.kind == kind)
+  return [dict(row._mapping) for row in db.session.execute(query)]
+
+#  Periodic jobs
+#  ----------------------------------------------------------------
+
+# Queue the jobs of JOB_SCHEDULE. Their key is the period they run for, so
+# that however many workers queue them, each runs once per period.
+def schedule_periodic():
+  now = time.time()
+  for kind, period in current_app.config['JOB_SCHEDULE'].items():
+    enqueue(kind, {}, key='%s:%d' % (kind, now // period), max_attempts=1)
+
+def roll_counters(report):
+  from models import roll_show_counters
+  with db.engine.begin() as connection:
+    return {'rolled': roll_show_counters(connection)}
+
+def purge_idempotency_keys(report):
+  from writes import purge_idempotency_keys
+  with db.engine.begin() as connection:
+    return {'purged': purge_idempotency_keys(connection)}
+
+# Fail the jobs lost with their worker on their last attempt, and delete the
+# jobs finished more than JOB_RETENTION seconds ago
+def purge_jobs(report):
+  table = Job.__table__
+  now = datetime.utcnow()
+  before = now - timedelta(seconds=current_app.config['JOB_RETENTION'])
+  with db.engine.begin() as connection:
+    failed = connection.execute(table.update()
+                                .where(table.c.status == 'running')
+                                .where(table.c.locked_until < now)
+                                .where(table.c.attempts >= table.c.max_attempts)
+                                .values(status='failed', error='Lost with its worker', key=None, locked_until=None,
+                                        finished_at=now)).rowcount
+    purged = connection.execute(table.delete()
+                                .where(table.c.status.in_(['done', 'failed']))
+                                .where(table.c.finished_at < before)).rowcount
+  return {'failed': failed, 'purged': purged}
+
+#  Workers
+#  ----------------------------------------------------------------
+
+# Threads running jobs until stopped. In burst mode, each thread stops once
+# no job is due, and periodic jobs are not queued.
+class Worker:
+  def __init__(self, app, threads, burst=False):
+    self.app = app
+    self.threads = [threading.Thread(target=self.work, name='job-%d' % index, daemon=True)
+                    for index in range(threads)]
+    self.burst = burst
+    self.stopping = threading.Event()
+    self.pending = threading.Event()
+    self.schedule_lock = threading.Lock()
+    self.next_schedule = 0
+  
+  def start(self):
+    for thread in self.threads:
+      thread.start()
+    return self
+  
+  # Stop once the running jobs are done
+  def stop(self):
+    self.stopping.set()
+    self.pending.set()
+  
+  def join(self):
+    for thread in self.threads:
+      while thread.is_alive():
+        thread.join(1)
+  
+  # Look for due jobs now rather than at the end of the poll interval
+  def wake(self):
+    self.pending.set()
+  
+  def work(self):
+    with self.app.app_context():
+      while not self.stopping.is_set():
+        try:
+          self.schedule()
+          if run_next():
+            continue
+        except Exception:
+          self.app.logger.exception('Job worker failed to claim a job')
+        if self.burst:
+          return
+        self.pending.wait(self.app.config['JOB_POLL_INTERVAL'])
+        self.pending.clear()
+  
+  # Queue the periodic jobs, at most once a minute per worker
+  def schedule(self):
+    with self.schedule_lock:
+      if self.burst or time.monotonic() < self.next_schedule:
+        return
+      self.next_schedule = time.monotonic() + 60
+    schedule_periodic()
+
+local_worker_lock = threading.Lock()
+
+# Worker of this process, started by the first job it enqueues
+def local_worker(app):
+  with local_worker_lock:
+    worker = app.extensions.get('jobs')
+    if worker is None:
+      worker = app.extensions['jobs'] = Worker(app, app.config['JOB_THREADS']).start()
+    return worker
+
+# Run a worker in this process until SIGTERM or SIGINT, or in burst mode
+# until no job is due
+def work(threads, burst=False, app=None):
+  if app is None:
+    from app import create_app
+    app = create_app()
+  worker = app.extensions['jobs'] = Worker(app, threads, burst)
+  for signum in (signal.SIGTERM, signal.SIGINT):
+    signal.signal(signum, lambda signum, frame: worker.stop())
+  worker.start().join()
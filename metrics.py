@@ -0,0 +1,115 @@
+import logging
+import os
+import time
+
+from database import WAIT_BUCKETS, TimedQueuePool
+from flask import Response, before_render_template, g, has_request_context, request, template_rendered
+
+#----------------------------------------------------------------------------#
+# Prometheus metrics.
+#
+# Request latency per route, template render time, database time, waits for
+# a pooled connection, page cache lookups and errors, served on /metrics. Under gunicorn, set
+# PROMETHEUS_MULTIPROC_DIR so that every worker writes its samples to
+# mmapped files there, and /metrics sums them over the workers.
+#
+# Labelled children are looked up once and kept, so recording a request
+# costs a few dictionary lookups and observe() calls.
+#----------------------------------------------------------------------------#
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Metrics:
+  def __init__(self):
+    from prometheus_client import Counter, Histogram
+    
+    self.request_duration = Histogram('fyyur_request_duration_seconds', 'Request latency by route.',
+                                      ['endpoint', 'method'], buckets=LATENCY_BUCKETS)
+    self.db_duration = Histogram('fyyur_request_db_seconds', 'Database time of requests by route.',
+                                 ['endpoint'], buckets=LATENCY_BUCKETS)
+    self.pool_wait = Histogram('fyyur_db_pool_wait_seconds', 'Time waited for a pooled database connection.',
+                               buckets=WAIT_BUCKETS)
+    self.queries = Counter('fyyur_queries_total', 'SQL queries run by requests, by route.', ['endpoint'])
+    self.template_duration = Histogram('fyyur_template_render_seconds', 'Template render time.',
+                                       ['template'], buckets=LATENCY_BUCKETS)
+    self.cache_lookups = Counter('fyyur_page_cache_lookups_total', 'Page cache lookups by result.', ['result'])
+    self.errors = Counter('fyyur_errors_total', 'Server error responses and logged errors, by route.',
+                          ['endpoint', 'kind'])
+    self.children = {}
+  
+  def child(self, metric, *labels):
+    key = (metric, labels)
+    child = self.children.get(key)
+    if child is None:
+      child = self.children[key] = metric.labels(*labels)
+    return child
+
+# Metrics are registered once per process, whatever the number of apps
+metrics = None
+
+# Count records logged at ERROR or above, such as the exceptions of requests
+class ErrorCounter(logging.Handler):
+  def __init__(self):
+    super().__init__(logging.ERROR)
+  
+  def emit(self, record):
+    endpoint = (request.endpoint if has_request_context() else None) or 'none'
+    metrics.child(metrics.errors, endpoint, 'logged').inc()
+
+def start_request():
+  g.metrics_started = time.perf_counter()
+
+def finish_request(response):
+  started = g.get('metrics_started')
+  if started is None:
+    return response
+  endpoint = request.endpoint or 'none'
+  metrics.child(metrics.request_duration, endpoint, request.method).observe(time.perf_counter() - started)
+  
+  stats = g.get('query_stats')
+  if stats is not None:
+    metrics.child(metrics.db_duration, endpoint).observe(stats.duration)
+    if stats.count:
+      metrics.child(metrics.queries, endpoint).inc(stats.count)
+  if 'cache_result' in g:
+    metrics.child(metrics.cache_lookups, g.cache_result).inc()
+  if response.status_code >= 500:
+    metrics.child(metrics.errors, endpoint, 'response').inc()
+  return response
+
+def start_template(sender, template, context, **extra):
+  g.setdefault('template_started', []).append(time.perf_counter())
+
+def finish_template(sender, template, context, **extra):
+  started = g.get('template_started')
+  if started:
+    metrics.child(metrics.template_duration, template.name or 'string').observe(time.perf_counter() - started.pop())
+
+def metrics_view():
+  from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+  
+  registry = REGISTRY
+  if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+  return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+def init_app(app):
+  global metrics
+  if not app.config['METRICS_ENABLED']:
+    return
+  try:
+    if metrics is None:
+      metrics = Metrics()
+  except ImportError:
+    app.logger.warning('prometheus_client is not installed, /metrics is disabled')
+    return
+  
+  app.before_request(start_request)
+  app.after_request(finish_request)
+  before_render_template.connect(start_template, app)
+  template_rendered.connect(finish_template, app)
+  app.logger.addHandler(ErrorCounter())
+  if metrics.pool_wait.observe not in TimedQueuePool.observers:
+    TimedQueuePool.observers.append(metrics.pool_wait.observe)
+  app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -88,6 +88,15 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        # Index builds and backfills may run longer than DB_STATEMENT_TIMEOUT,
+        # which only applies to the app. The session setting also covers
+        # the statements run outside of a transaction, such as CREATE INDEX
+        # CONCURRENTLY, but would outlive the migration behind PgBouncer.
+        connection = connection.execution_options(statement_timeout=0)
+        if connection.dialect.name == 'postgresql' and not current_app.config['DB_TRANSACTION_POOLING']:
+            with connection.begin():
+                connection.exec_driver_sql('SET statement_timeout = 0')
+
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
@@ -0,0 +1,44 @@
+"""empty message
+
+Revision ID: 2c9e8d41a7f3
+Revises: 6164fbf43851
+Create Date: 2026-10-17 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c9e8d41a7f3'
+down_revision = '6164fbf43851'
+branch_labels = None
+depends_on = None
+
+
+# Trigram indexes backing the ILIKE matches of search.PostgresSearch
+INDEXES = [
+    ('ix_Venue_name_trgm', 'Venue', 'name'),
+    ('ix_Venue_location_trgm', 'Venue', "(city || ', ' || state)"),
+    ('ix_Venue_genres_trgm', 'Venue', 'genres'),
+    ('ix_Artist_name_trgm', 'Artist', 'name'),
+    ('ix_Artist_location_trgm', 'Artist', "(city || ', ' || state)"),
+    ('ix_Artist_genres_trgm', 'Artist', 'genres'),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, expression in INDEXES:
+        op.execute('CREATE INDEX "{}" ON "{}" USING gin ({} gin_trgm_ops)'.format(name, table, expression))
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for name, _, _ in INDEXES:
+        op.execute('DROP INDEX IF EXISTS "{}"'.format(name))
@@ -0,0 +1,71 @@
+"""empty message
+
+Revision ID: 5d2b8e4f7a13
+Revises: e3a97c5d21b8
+Create Date: 2026-10-17 19:26:05.338417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2b8e4f7a13'
+down_revision = 'e3a97c5d21b8'
+branch_labels = None
+depends_on = None
+
+# Foreign keys to venues and artists: (table, column, referred table)
+FOREIGN_KEYS = [
+    ('Show', 'venue_id', 'Venue'),
+    ('Show', 'artist_id', 'Artist'),
+    ('VenueGenre', 'venue_id', 'Venue'),
+    ('ArtistGenre', 'artist_id', 'Artist'),
+]
+
+
+def replace_foreign_keys(ondelete):
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    for table, column, referred in FOREIGN_KEYS:
+        name = '{}_{}_fkey'.format(table, column)
+        if postgresql:
+            op.execute('ALTER TABLE "{}" DROP CONSTRAINT "{}", ADD CONSTRAINT "{}" FOREIGN KEY ({}) '
+                       'REFERENCES "{}" (id){} NOT VALID'.format(
+                           table, name, name, column, referred, ' ON DELETE ' + ondelete if ondelete else ''))
+        else:
+            # SQLite does not name the constraints, the batch rebuilding the
+            # table names them after the Postgres convention
+            with op.batch_alter_table(table, naming_convention={'fk': '%(table_name)s_%(column_0_name)s_fkey'}) as batch_op:
+                batch_op.drop_constraint(name, type_='foreignkey')
+                batch_op.create_foreign_key(name, referred, [column], ['id'], ondelete=ondelete)
+    if postgresql:
+        # The constraints were added NOT VALID. Committing releases the
+        # ACCESS EXCLUSIVE locks of the ALTERs, so that the scans checking
+        # the existing rows run under VALIDATE's lock, which lets writes
+        # through.
+        with op.get_context().autocommit_block():
+            for table, column, referred in FOREIGN_KEYS:
+                op.execute('ALTER TABLE "{}" VALIDATE CONSTRAINT "{}_{}_fkey"'.format(table, table, column))
+
+
+def upgrade():
+    replace_foreign_keys('CASCADE')
+    op.create_table('Job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=64), nullable=False),
+    sa.Column('args', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('done', sa.Integer(), nullable=True),
+    sa.Column('total', sa.Integer(), nullable=True),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('Job')
+    replace_foreign_keys(None)
@@ -0,0 +1,44 @@
+"""empty message
+
+Revision ID: 7c3f5a92e8b4
+Revises: 4e7a9c0d1f62
+Create Date: 2026-10-17 15:02:37.504918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3f5a92e8b4'
+down_revision = '4e7a9c0d1f62'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_Show_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_Show_artist_id_start_time', ['artist_id', 'start_time']),
+]
+
+
+def upgrade():
+    # Built without locking Show against writes on Postgres, which cannot run
+    # CREATE INDEX CONCURRENTLY inside the migration transaction
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, columns in INDEXES:
+                op.create_index(name, 'Show', columns, unique=False, postgresql_concurrently=True)
+    else:
+        for name, columns in INDEXES:
+            op.create_index(name, 'Show', columns, unique=False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, _ in INDEXES:
+                op.drop_index(name, table_name='Show', postgresql_concurrently=True)
+    else:
+        for name, _ in INDEXES:
+            op.drop_index(name, table_name='Show')
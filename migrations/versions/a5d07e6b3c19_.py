@@ -0,0 +1,89 @@
+"""empty message
+
+Revision ID: a5d07e6b3c19
+Revises: 2c9e8d41a7f3
+Create Date: 2026-10-17 10:04:17.552630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5d07e6b3c19'
+down_revision = '2c9e8d41a7f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    genre = op.create_table('Genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    associations = {}
+    for table in ('Venue', 'Artist'):
+        key = table.lower() + '_id'
+        associations[table] = op.create_table(table + 'Genre',
+        sa.Column(key, sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint([key], [table + '.id'], ),
+        sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ),
+        sa.PrimaryKeyConstraint(key, 'genre_id')
+        )
+        op.create_index('ix_{}Genre_genre_id'.format(table), table + 'Genre', ['genre_id', key], unique=False)
+
+    # Move the comma-separated genres strings into the association tables
+    connection = op.get_bind()
+    genre_ids = {}
+    for table, association in associations.items():
+        owner = sa.table(table, sa.column('id', sa.Integer), sa.column('genres', sa.String))
+        links = []
+        for id, genres in connection.execute(sa.select([owner.c.id, owner.c.genres])):
+            names = dict.fromkeys(name.strip() for name in (genres or '').split(',') if name.strip())
+            for name in names:
+                if name not in genre_ids:
+                    result = connection.execute(genre.insert().values(name=name))
+                    genre_ids[name] = result.inserted_primary_key[0]
+                links.append({table.lower() + '_id': id, 'genre_id': genre_ids[name]})
+        if links:
+            op.bulk_insert(association, links)
+
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('genres')
+
+
+def downgrade():
+    connection = op.get_bind()
+    genre = sa.table('Genre', sa.column('id', sa.Integer), sa.column('name', sa.String))
+    for table in ('Venue', 'Artist'):
+        key = table.lower() + '_id'
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('genres', sa.String(length=500), nullable=True))
+
+        owner = sa.table(table, sa.column('id', sa.Integer), sa.column('genres', sa.String))
+        association = sa.table(table + 'Genre', sa.column(key, sa.Integer), sa.column('genre_id', sa.Integer))
+        genres = {}
+        rows = connection.execute(
+            sa.select([association.c[key], genre.c.name])
+            .select_from(association.join(genre, genre.c.id == association.c.genre_id))
+            .order_by(association.c[key], genre.c.name))
+        for id, name in rows:
+            genres.setdefault(id, []).append(name)
+        for id, names in genres.items():
+            connection.execute(owner.update().where(owner.c.id == id).values(genres=','.join(names)))
+        connection.execute(owner.update().where(owner.c.genres.is_(None)).values(genres=''))
+
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('genres', existing_type=sa.String(length=500), nullable=False)
+
+        op.drop_index('ix_{}Genre_genre_id'.format(table), table_name=table + 'Genre')
+        op.drop_table(table + 'Genre')
+
+    op.drop_table('Genre')
+
+    if connection.dialect.name == 'postgresql':
+        for table in ('Venue', 'Artist'):
+            op.execute('CREATE INDEX "ix_{0}_genres_trgm" ON "{0}" USING gin (genres gin_trgm_ops)'.format(table))
@@ -0,0 +1,34 @@
+"""empty message
+
+Revision ID: b81d4e6f0a27
+Revises: 7c3f5a92e8b4
+Create Date: 2026-10-17 15:48:12.093561
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b81d4e6f0a27'
+down_revision = '7c3f5a92e8b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Built without locking Show against writes on Postgres, outside of the
+    # migration transaction
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.create_index(op.f('ix_Show_start_time'), 'Show', ['start_time'], unique=False, postgresql_concurrently=True)
+    else:
+        op.create_index(op.f('ix_Show_start_time'), 'Show', ['start_time'], unique=False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.drop_index(op.f('ix_Show_start_time'), table_name='Show', postgresql_concurrently=True)
+    else:
+        op.drop_index(op.f('ix_Show_start_time'), table_name='Show')
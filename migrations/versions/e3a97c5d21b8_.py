@@ -0,0 +1,31 @@
+"""empty message
+
+Revision ID: e3a97c5d21b8
+Revises: b81d4e6f0a27
+Create Date: 2026-10-17 18:02:47.512308
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a97c5d21b8'
+down_revision = 'b81d4e6f0a27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('IdempotencyKey',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_IdempotencyKey_created_at'), 'IdempotencyKey', ['created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_IdempotencyKey_created_at'), table_name='IdempotencyKey')
+    op.drop_table('IdempotencyKey')
@@ -0,0 +1,31 @@
+"""empty message
+
+Revision ID: f4b81c3e6a90
+Revises: c72e0b5a9d14
+Create Date: 2026-10-18 09:41:27.190355
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b81c3e6a90'
+down_revision = 'c72e0b5a9d14'
+branch_labels = None
+depends_on = None
+
+
+# Trigram index backing the genre branch of search.matching_ids
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE INDEX "ix_Genre_name_trgm" ON "Genre" USING gin (name gin_trgm_ops)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('DROP INDEX IF EXISTS "ix_Genre_name_trgm"')
@@ -1,10 +1,30 @@
-from flask_sqlalchemy import SQLAlchemy
+from database import RoutingSQLAlchemy
+from datetime import datetime
+from itertools import groupby
 
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()
+
+venue_genres = db.Table('VenueGenre',
+  db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+  db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+  db.Index('ix_VenueGenre_genre_id', 'genre_id', 'venue_id')
+)
+
+artist_genres = db.Table('ArtistGenre',
+  db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+  db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+  db.Index('ix_ArtistGenre_genre_id', 'genre_id', 'artist_id')
+)
+
+class Genre(db.Model):
+  __tablename__ = 'Genre'
+  
+  id = db.Column(db.Integer, primary_key=True)
+  name = db.Column(db.String(120), nullable=False, unique=True)
 
 class Venue(db.Model):
     __tablename__ = 'Venue'
-
+    
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120), nullable=False)
@@ -13,110 +33,348 @@ class Venue(db.Model):
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
-    genres = db.Column(db.String(500), nullable=False)
+    genres = db.relationship('Genre', secondary=venue_genres, order_by='Genre.name', passive_deletes=True)
     website = db.Column(db.String)
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String)
     
+    # Show counters, maintained by the Show mapper events and rolled forward by
+    # `flask counters roll` once next_show_time has passed
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_time = db.Column(db.DateTime, index=True)
+    
+    # Bumped on every update, the API derives its ETags from it
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1',
+                        onupdate=db.literal_column('version + 1'))
+    
     __table_args__ = (db.UniqueConstraint('name', 'city', 'state'),)
     
-    # Update venue data
-    def update(cls, data):
-      for key, value in data.items():
-        if key=="seeking_talent":  # request.form.get don't return bool values
-          if value=="y":
-            value = True
-          else:
-            value = False 
-        setattr(cls, key, value)
-      return cls
-    
-    # Get shows that happened in the past
-    def get_past_shows(cls, date):
-      shows = cls.shows
-      past_shows = [] 
-      for show in shows:
-        if show.start_time <= date:
-          show.artist_name = show.artists.name
-          show.artist_image_link = show.artists.image_link
-          past_shows.append(show)
-      return past_shows
-    
-    # Get shows that will happen in the future
-    def get_upcoming_shows(cls, date):
-      shows = cls.shows
-      upcoming_shows = [] 
-      for show in shows:
-        if show.start_time > date:
-          show.artist_name = show.artists.name
-          show.artist_image_link = show.artists.image_link
-          upcoming_shows.append(show)
-      return upcoming_shows
+    # Get shows that happened in the past, most recent first
+    def get_past_shows(cls, date, limit=None):
+      return shows_query(Show.venue_id == cls.id, Artist, date, upcoming=False, limit=limit)
+    
+    # Get shows that will happen in the future, soonest first
+    def get_upcoming_shows(cls, date, limit=None):
+      return shows_query(Show.venue_id == cls.id, Artist, date, upcoming=True, limit=limit)
+    
+    # Get past and upcoming shows, and how many there are of each, in a single query
+    def get_shows(cls, date, limit=None):
+      return split_shows(Show.venue_id == cls.id, Artist, date, limit=limit)
+    
+    # Query venues with their number of upcoming shows
+    @staticmethod
+    def get_listing():
+      return db.session.query(
+          Venue.id,
+          Venue.name,
+          Venue.city,
+          Venue.state,
+          Venue.upcoming_shows_count.label('num_upcoming_shows')
+        )
+    
+    # Group venue rows, ordered by city and state, into areas
+    @staticmethod
+    def get_areas(venues):
+      for (city, state), area_venues in groupby(venues, key=lambda venue: (venue.city, venue.state)):
+        yield {"city": city,
+               "state": state,
+               "venues": area_venues
+               }
 class Artist(db.Model):
     __tablename__ = 'Artist'
-
+    
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)  
     city = db.Column(db.String(120), nullable=False)  
     state = db.Column(db.String(120), nullable=False) 
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(500), nullable=False)
+    genres = db.relationship('Genre', secondary=artist_genres, order_by='Genre.name', passive_deletes=True)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String)
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String)
     
+    # Show counters, maintained by the Show mapper events and rolled forward by
+    # `flask counters roll` once next_show_time has passed
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_time = db.Column(db.DateTime, index=True)
+    
+    # Bumped on every update, the API derives its ETags from it
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1',
+                        onupdate=db.literal_column('version + 1'))
+    
     __table_args__ = (db.UniqueConstraint('name', 'city', 'state'),)
     
-    # Update artist data
-    def update(cls, data):
-      for key, value in data.items():
-        if key=="seeking_talent":  # request.form.get don't return bool values
-          if value=="y":
-            value = True
-          else:
-            value = False 
-        setattr(cls, key, value)
-      return cls
-    
-     # Get shows that happened in the past
-    def get_past_shows(cls, date):
-      shows = cls.shows
-      past_shows = [] 
-      for show in shows:
-        if show.start_time <= date:
-          show.venue_name = show.venues.name
-          show.venue_image_link = show.venues.image_link
-          past_shows.append(show)
-      return past_shows
-    
-    # Get shows that will happen in the future
-    def get_upcoming_shows(cls, date):
-      shows = cls.shows
-      upcoming_shows = [] 
-      for show in shows:
-        if show.start_time > date:
-          show.venue_name = show.venues.name
-          show.venue_image_link = show.venues.image_link
-          upcoming_shows.append(show)
-      return upcoming_shows
+    # Get shows that happened in the past, most recent first
+    def get_past_shows(cls, date, limit=None):
+      return shows_query(Show.artist_id == cls.id, Venue, date, upcoming=False, limit=limit)
+    
+    # Get shows that will happen in the future, soonest first
+    def get_upcoming_shows(cls, date, limit=None):
+      return shows_query(Show.artist_id == cls.id, Venue, date, upcoming=True, limit=limit)
+    
+    # Get past and upcoming shows, and how many there are of each, in a single query
+    def get_shows(cls, date, limit=None):
+      return split_shows(Show.artist_id == cls.id, Venue, date, limit=limit)
     
 class Show(db.Model):
   __tablename__ = "Show"
+  # Shows of a venue or an artist in start time order, for scheduling conflicts
+  # and the venue and artist pages
+  __table_args__ = (
+    db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+  )
+  
+  id = db.Column(db.Integer, primary_key=True)
+  
+  # Previous values are kept when these change, to update the counters of both
+  # sides. Deleting a venue or artist deletes its shows in the database.
+  venue_id = db.column_property(db.Column(db.Integer, db.ForeignKey("Venue.id", ondelete='CASCADE'), nullable=False),
+                                active_history=True)
+  artist_id = db.column_property(db.Column(db.Integer, db.ForeignKey("Artist.id", ondelete='CASCADE'), nullable=False),
+                                 active_history=True)
+  
+  start_time = db.Column(db.DateTime, index=True)
+  
+  # Bumped on every update, the API derives its ETags from it
+  version = db.Column(db.Integer, nullable=False, default=1, server_default='1',
+                      onupdate=db.literal_column('version + 1'))
+  
+  # Loaded on access, one query per instance: views that need them pass
+  # selectinload()/joinedload() options, or select the columns they show.
+  # The shows of a deleted venue or artist are left to ON DELETE CASCADE
+  # rather than loaded.
+  venue = db.relationship("Venue", backref=db.backref("shows", passive_deletes=True))
+  artist = db.relationship("Artist", backref=db.backref("shows", passive_deletes=True))
+  
+  # Query shows with the venue and artist details shown on a show tile
+  @staticmethod
+  def get_listing():
+    return db.session.query(
+        Show.id,
+        Show.start_time,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link')
+      ) \
+      .join(Venue, Show.venue_id == Venue.id) \
+      .join(Artist, Show.artist_id == Artist.id)
+
+# Result of a form post, under the idempotency key sent with it, so that a
+# retried post gets the first result back instead of writing again
+class IdempotencyKey(db.Model):
+  __tablename__ = 'IdempotencyKey'
+  
+  key = db.Column(db.String(64), primary_key=True)
+  created_at = db.Column(db.DateTime, nullable=False, index=True)
+  result = db.Column(db.JSON)
+
+# Work run in the background, see jobs.py. Status is queued, running, done or
+# failed; done and total measure the progress of a running job. Queued jobs
+# run from run_at on, and a running job whose worker has not reported by
+# locked_until is run again. Jobs enqueued with a key are only queued once;
+# failing releases the key, so that the work can be queued again.
+class Job(db.Model):
+  __tablename__ = 'Job'
+  __table_args__ = (db.Index('ix_Job_status_run_at', 'status', 'run_at'),)
   
   id = db.Column(db.Integer, primary_key=True)
+  kind = db.Column(db.String(64), nullable=False)
+  args = db.Column(db.JSON, nullable=False)
+  key = db.Column(db.String(128), unique=True)
+  status = db.Column(db.String(16), nullable=False)
+  attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+  max_attempts = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+  run_at = db.Column(db.DateTime, nullable=False)
+  locked_until = db.Column(db.DateTime)
+  done = db.Column(db.Integer)
+  total = db.Column(db.Integer)
+  result = db.Column(db.JSON)
+  error = db.Column(db.Text)
+  created_at = db.Column(db.DateTime, nullable=False)
+  started_at = db.Column(db.DateTime)
+  finished_at = db.Column(db.DateTime)
+
+# Restrict a query on venues or artists to those with the given genre, through
+# the (genre_id, venue_id) / (genre_id, artist_id) index of the association table
+def filter_by_genre(query, model, genre):
+  association = model.genres.property.secondary
+  key = association.c[model.__tablename__.lower() + '_id']
+  return query \
+    .join(association, key == model.id) \
+    .join(Genre, Genre.id == association.c.genre_id) \
+    .filter(Genre.name == genre)
+
+# Show tile of a venue, artist or shows page. Cards are read-only copies of
+# query rows, so rendering never loads, mutates or dirties ORM instances.
+class ShowCard:
+  __slots__ = ('id', 'start_time', 'venue_id', 'venue_name', 'venue_image_link',
+               'artist_id', 'artist_name', 'artist_image_link')
   
-  venue_id = db.Column(db.Integer, db.ForeignKey("Venue.id"), nullable=False)
-  artist_id = db.Column(db.Integer, db.ForeignKey("Artist.id"), nullable=False)
+  # Columns missing from the row, such as the venue on a venue page, are None
+  def __init__(self, row):
+    mapping = row._mapping
+    for name in self.__slots__:
+      object.__setattr__(self, name, mapping.get(name))
   
-  start_time = db.Column(db.DateTime)
+  def __setattr__(self, name, value):
+    raise AttributeError('ShowCard is read-only')
   
-  venues = db.relationship("Venue", backref="shows", lazy=True)
-  artists = db.relationship("Artist", backref="shows", lazy=True)
+  def __repr__(self):
+    return '<ShowCard %s %s>' % (self.id, self.start_time)
+
+# Columns needed to render a show tile: the start time plus the id, name and
+# image of the other side of the show (the artist on a venue page and vice versa)
+def show_tile_columns(other):
+  prefix = other.__tablename__.lower()
+  return (Show.start_time,
+          other.id.label(prefix + '_id'),
+          other.name.label(prefix + '_name'),
+          other.image_link.label(prefix + '_image_link'))
+
+# Select the past or upcoming shows matching `condition`, soonest upcoming or
+# most recent past shows first
+def shows_select(condition, other, date, upcoming, limit=None):
+  query = db.select(show_tile_columns(other)) \
+    .join(other, getattr(Show, other.__tablename__.lower() + '_id') == other.id) \
+    .where(condition)
+  
+  if upcoming:
+    query = query.where(Show.start_time > date).order_by(Show.start_time, Show.id)
+  else:
+    query = query.where(Show.start_time <= date).order_by(Show.start_time.desc(), Show.id.desc())
+  
+  if limit is not None:
+    query = query.limit(limit)
+  return query
+
+# Get the past or upcoming shows matching `condition` as show cards
+def shows_query(condition, other, date, upcoming, limit=None):
+  return [ShowCard(row) for row in db.session.execute(shows_select(condition, other, date, upcoming, limit))]
+
+# Select the number of past and upcoming shows matching `condition`
+def show_counts_select(condition, date):
+  return db.select([
+      db.func.coalesce(db.func.sum(db.case([(Show.start_time <= date, 1)], else_=0)), 0).label('past_shows_count'),
+      db.func.coalesce(db.func.sum(db.case([(Show.start_time > date, 1)], else_=0)), 0).label('upcoming_shows_count')
+    ]) \
+    .where(condition)
+
+# Get the shows matching `condition` split into past and upcoming shows. Both
+# partitions are numbered by a window function, so at most `limit` shows of each
+# are loaded while the counts still cover every show.
+def split_shows(condition, other, date, limit=None):
+  is_upcoming = Show.start_time > date
   
-  # Update show data
-  def update(cls, data):
-    for key, value in data.items():
-      setattr(cls, key, value)
-    return cls
\ No newline at end of file
+  ranked = db.session.query(
+      *show_tile_columns(other),
+      is_upcoming.label('is_upcoming'),
+      db.func.row_number().over(partition_by=is_upcoming,
+                                order_by=(Show.start_time, Show.id)).label('position'),
+      db.func.count().over(partition_by=is_upcoming).label('total')
+    ) \
+    .join(other, getattr(Show, other.__tablename__.lower() + '_id') == other.id) \
+    .filter(condition) \
+    .subquery()
+  
+  query = db.session.query(ranked)
+  if limit is not None:
+    # Soonest upcoming shows and most recent past shows
+    query = query.filter(db.or_(
+      db.and_(ranked.c.is_upcoming == True, ranked.c.position <= limit),
+      db.and_(ranked.c.is_upcoming == False, ranked.c.position > ranked.c.total - limit)))
+  rows = query.order_by(ranked.c.is_upcoming, ranked.c.position).all()
+  
+  past_rows = [row for row in rows if not row.is_upcoming]
+  past_rows.reverse()
+  upcoming_rows = [row for row in rows if row.is_upcoming]
+  
+  # Once the soonest upcoming show starts, this split is out of date
+  return {"past_shows": [ShowCard(row) for row in past_rows],
+          "past_shows_count": past_rows[0].total if past_rows else 0,
+          "upcoming_shows": [ShowCard(row) for row in upcoming_rows],
+          "upcoming_shows_count": upcoming_rows[0].total if upcoming_rows else 0,
+          "next_show_time": upcoming_rows[0].start_time if upcoming_rows else None
+          }
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+# Column linking a show to a venue or artist
+def show_key(model):
+  return getattr(Show, model.__tablename__.lower() + '_id')
+
+# Counter values of each venue or artist as of `date`, as subqueries
+# correlated to the model's table
+def show_counters(model, date):
+  shows = db.select([db.func.count(Show.id)]).where(show_key(model) == model.__table__.c.id)
+  return {
+    'upcoming_shows_count': shows.where(Show.start_time > date).scalar_subquery(),
+    'past_shows_count': shows.where(Show.start_time <= date).scalar_subquery(),
+    'next_show_time': db.select([db.func.min(Show.start_time)])
+      .where(show_key(model) == model.__table__.c.id)
+      .where(Show.start_time > date)
+      .scalar_subquery()
+  }
+
+# Recompute the counters of the venues or artists with the given ids, or of
+# all of them when `ids` is None
+def refresh_show_counters(connection, model, ids=None, date=None):
+  statement = model.__table__.update().values(**show_counters(model, date or datetime.today()))
+  if ids is not None:
+    statement = statement.where(model.__table__.c.id.in_(list(ids)))
+  return connection.execute(statement).rowcount
+
+# Recompute the counters of the venues and artists whose next upcoming show
+# has started since they were last computed
+def roll_show_counters(connection, date=None):
+  date = date or datetime.today()
+  rolled = 0
+  for model in (Venue, Artist):
+    statement = model.__table__.update() \
+      .where(model.__table__.c.next_show_time <= date) \
+      .values(**show_counters(model, date))
+    rolled += connection.execute(statement).rowcount
+  return rolled
+
+# Ids of the venues or artists whose stored counters differ from the shows
+def find_stale_show_counters(connection, model, date=None):
+  expected = show_counters(model, date or datetime.today())
+  table = model.__table__
+  query = db.select([table.c.id]).where(db.or_(
+    table.c.upcoming_shows_count != expected['upcoming_shows_count'],
+    table.c.past_shows_count != expected['past_shows_count'],
+    db.func.coalesce(table.c.next_show_time != expected['next_show_time'],
+                     (table.c.next_show_time == None) != (expected['next_show_time'] == None))))
+  return [id for id, in connection.execute(query)]
+
+@db.event.listens_for(Show, 'after_insert')
+@db.event.listens_for(Show, 'after_update')
+@db.event.listens_for(Show, 'after_delete')
+def update_show_counters(mapper, connection, target):
+  state = db.inspect(target)
+  for model in (Venue, Artist):
+    attribute = state.attrs[model.__tablename__.lower() + '_id']
+    ids = {attribute.value, *attribute.history.deleted} - {None}
+    refresh_show_counters(connection, model, ids)
+
+#----------------------------------------------------------------------------#
+# Versions.
+#----------------------------------------------------------------------------#
+
+# Genres live in association tables, so changing them does not update the
+# venue or artist row by itself. Bump the version of saved rows explicitly.
+@db.event.listens_for(Venue.genres, 'append')
+@db.event.listens_for(Venue.genres, 'remove')
+@db.event.listens_for(Artist.genres, 'append')
+@db.event.listens_for(Artist.genres, 'remove')
+def bump_version(target, value, initiator):
+  if db.inspect(target).persistent:
+    target.version = type(target).version + 1
@@ -0,0 +1,64 @@
+import base64
+import json
+
+from datetime import datetime
+from flask import abort
+from models import db
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#----------------------------------------------------------------------------#
+
+# Cursors are the sort key of the last row of a page, as url-safe base64 JSON
+def encode_cursor(values):
+  values = [{"datetime": value.isoformat()} if isinstance(value, datetime) else value
+            for value in values]
+  return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor):
+  values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+  if not isinstance(values, list):
+    raise ValueError('Invalid cursor')
+  return [datetime.fromisoformat(value["datetime"]) if isinstance(value, dict) else value
+          for value in values]
+
+# Whether a cursor value can be compared with a column of the sort key
+# without the database rejecting it: a value of the column's type, in the
+# range of a 32-bit integer for integers, and without NUL for strings
+def valid_value(value, column):
+  if value is None:
+    return column.expression.nullable
+  python_type = column.type.python_type
+  if python_type is int:
+    return type(value) is int and -2 ** 31 <= value < 2 ** 31
+  if python_type is str:
+    return isinstance(value, str) and '\x00' not in value
+  return isinstance(value, python_type)
+
+# A page of `query` ordered by `columns`, starting after the row encoded in
+# `cursor`. Rows are fetched lazily while the page is iterated, and
+# `next_cursor` is set once iteration reaches a row past the end of the page.
+class Page:
+  def __init__(self, query, columns, cursor=None, limit=100):
+    if cursor:
+      try:
+        after = decode_cursor(cursor)
+      except (ValueError, KeyError, TypeError):
+        abort(400)
+      if len(after) != len(columns) or not all(map(valid_value, after, columns)):
+        abort(400)
+      query = query.filter(db.tuple_(*columns) > db.tuple_(*after))
+    
+    self.query = query.order_by(*columns).limit(limit + 1)
+    self.keys = [column.key for column in columns]
+    self.limit = limit
+    self.next_cursor = None
+  
+  def __iter__(self):
+    last = None
+    for count, row in enumerate(self.query):
+      if count == self.limit:
+        self.next_cursor = encode_cursor([getattr(last, key) for key in self.keys])
+        break
+      last = row
+      yield row
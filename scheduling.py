@@ -0,0 +1,126 @@
+from bisect import bisect_left, insort
+from datetime import timedelta
+from itertools import count
+from flask import current_app
+from importer import validate
+from models import Artist, Show, Venue, db, refresh_show_counters
+
+#----------------------------------------------------------------------------#
+# Show scheduling.
+#
+# A show books its venue and its artist for SHOW_DURATION_HOURS. Proposed
+# shows are checked against the existing bookings of their venues and
+# artists, read with one range scan per side on the (venue_id, start_time)
+# and (artist_id, start_time) indexes, and against the proposals accepted
+# before them. The venue and artist rows are locked for the transaction so
+# that concurrent batches cannot book the same slot.
+#----------------------------------------------------------------------------#
+
+SIDES = (('venue', Venue), ('artist', Artist))
+
+def parse_proposal(index, row):
+  if not isinstance(row, dict):
+    return None, {'index': index, 'status': 'invalid', 'errors': {'show': ['Expected an object']}}
+  data, errors = validate('shows', row)
+  if not errors:
+    for side, _ in SIDES:
+      if not (data[side + '_id'] or '').isdigit():
+        errors = dict(errors or {}, **{side + '_id': ['Expected an id']})
+  if errors:
+    return None, {'index': index, 'status': 'invalid', 'errors': errors}
+  return {'index': index, 'venue_id': int(data['venue_id']), 'artist_id': int(data['artist_id']),
+          'start_time': data['start_time']}, None
+
+# Lock the given venues or artists for the transaction, so that concurrent
+# writers cannot book the same slot. Returns the ids that exist.
+def lock_ids(connection, model, ids):
+  table = model.__table__
+  return {id for id, in connection.execute(
+    db.select([table.c.id]).where(table.c.id.in_(list(ids))).order_by(table.c.id).with_for_update())}
+
+# Bookings of the given venues or artists between start and end, as lists of
+# (start_time, sequence, booking) sorted by start time, by venue or artist id
+def get_bookings(connection, side, ids, start, end, sequence):
+  table = Show.__table__
+  key = table.c[side + '_id']
+  bookings = {id: [] for id in ids}
+  rows = connection.execute(
+    db.select([key, table.c.start_time, table.c.id])
+    .where(key.in_(list(ids)))
+    .where(table.c.start_time > start)
+    .where(table.c.start_time < end)
+    .order_by(key, table.c.start_time))
+  for id, start_time, show_id in rows:
+    bookings[id].append((start_time, next(sequence), {'show_id': show_id}))
+  return bookings
+
+# Bookings overlapping a show starting at the given time
+def find_conflicts(bookings, start_time, duration):
+  conflicts = []
+  position = bisect_left(bookings, (start_time - duration,))
+  for booked_time, _, booking in bookings[position:]:
+    if booked_time >= start_time + duration:
+      break
+    if booked_time > start_time - duration:
+      conflicts.append(dict(booking, start_time=booked_time))
+  return conflicts
+
+def insert_shows(connection, rows):
+  table = Show.__table__
+  if connection.dialect.implicit_returning:
+    statement = table.insert().values(rows).returning(table.c.id, table.c.venue_id, table.c.start_time)
+    ids = {(venue_id, start_time): id for id, venue_id, start_time in connection.execute(statement)}
+    return [ids[(row['venue_id'], row['start_time'])] for row in rows]
+  return [connection.execute(table.insert(), row).inserted_primary_key[0] for row in rows]
+
+# Insert the proposed shows that do not overlap another show of their venue or
+# artist, in a single transaction. Returns a report entry per proposal.
+def schedule_shows(rows):
+  duration = timedelta(hours=current_app.config['SHOW_DURATION_HOURS'])
+  report = [None] * len(rows)
+  proposals = []
+  for index, row in enumerate(rows):
+    proposal, entry = parse_proposal(index, row)
+    if proposal is None:
+      report[index] = entry
+    else:
+      proposals.append(proposal)
+  if not proposals:
+    return report
+  
+  start = min(proposal['start_time'] for proposal in proposals) - duration
+  end = max(proposal['start_time'] for proposal in proposals) + duration
+  
+  with db.engine.begin() as connection:
+    known, bookings, sequence = {}, {}, count()
+    for side, model in SIDES:
+      known[side] = lock_ids(connection, model, {proposal[side + '_id'] for proposal in proposals})
+      bookings[side] = get_bookings(connection, side, known[side], start, end, sequence)
+    
+    accepted = []
+    for proposal in proposals:
+      index, start_time = proposal['index'], proposal['start_time']
+      errors = {side + '_id': ['Unknown %s' % side] for side, _ in SIDES if proposal[side + '_id'] not in known[side]}
+      if errors:
+        report[index] = {'index': index, 'status': 'invalid', 'errors': errors}
+        continue
+      
+      conflicts = []
+      for side, _ in SIDES:
+        for conflict in find_conflicts(bookings[side][proposal[side + '_id']], start_time, duration):
+          conflicts.append(dict(conflict, side=side))
+      if conflicts:
+        report[index] = {'index': index, 'status': 'conflict', 'conflicts': conflicts}
+        continue
+      
+      for side, _ in SIDES:
+        insort(bookings[side][proposal[side + '_id']], (start_time, next(sequence), {'index': index}))
+      accepted.append(proposal)
+    
+    if accepted:
+      rows = [{key: proposal[key] for key in ('venue_id', 'artist_id', 'start_time')} for proposal in accepted]
+      for proposal, id in zip(accepted, insert_shows(connection, rows)):
+        report[proposal['index']] = dict(proposal, status='created', id=id)
+      refresh_show_counters(connection, Venue, {proposal['venue_id'] for proposal in accepted})
+      refresh_show_counters(connection, Artist, {proposal['artist_id'] for proposal in accepted})
+  return report
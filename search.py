@@ -0,0 +1,186 @@
+import re
+import threading
+
+from flask import current_app
+from instrumentation import outside_budget
+from models import Genre, db
+
+#----------------------------------------------------------------------------#
+# Search.
+#
+# Venues and artists are matched on name, "city, state" and genres, ranked by
+# trigram similarity. On Postgres the matching runs in SQL, backed by the
+# pg_trgm GIN indexes (the genre index is on Genre.name); other databases
+# (SQLite in test runs) use an in-process trigram index. The backend can be
+# forced with the SEARCH_BACKEND setting.
+#----------------------------------------------------------------------------#
+
+# Relative weight of a match on each searchable field
+NAME_WEIGHT = 1.0
+LOCATION_WEIGHT = 0.5
+GENRES_WEIGHT = 0.25
+
+# Same expression as the location trigram index, so the planner can use it
+def location(model):
+  return model.city + db.literal_column("', '") + model.state
+
+def like_pattern(term):
+  return '%' + re.sub(r'([\\%_])', r'\\\1', term) + '%'
+
+# Genre names of the venue or artist in the enclosing query
+def genre_names(model):
+  association = model.genres.property.secondary
+  return db.session.query(Genre.name) \
+    .join(association, association.c.genre_id == Genre.id) \
+    .filter(association.c[model.__tablename__.lower() + '_id'] == model.id)
+
+# Query venues or artists with their number of upcoming shows
+def listing_query(model):
+  return db.session.query(model.id, model.name, model.upcoming_shows_count.label('num_upcoming_shows'))
+
+
+# Ids of the venues or artists matching on name, location or a genre, as a
+# UNION of one query per field. Each one can use its own trigram index, where
+# the same conditions ORed together would scan the table.
+def matching_ids(model, pattern):
+  association = model.genres.property.secondary
+  key = association.c[model.__tablename__.lower() + '_id']
+  return db.union(
+    db.select([model.id.label('id')]).where(model.name.ilike(pattern, escape='\\')),
+    db.select([model.id.label('id')]).where(location(model).ilike(pattern, escape='\\')),
+    db.select([key.label('id')])
+      .select_from(association.join(Genre, Genre.id == association.c.genre_id))
+      .where(Genre.name.ilike(pattern, escape='\\'))
+  ).subquery()
+
+# Ranked matching in Postgres with pg_trgm. Only the matching rows are ranked;
+# the result count and the number of upcoming shows come back with the
+# results, in a single query.
+class PostgresSearch:
+  def search(self, model, term, limit):
+    matches = matching_ids(model, like_pattern(term))
+    genre_similarity = genre_names(model) \
+      .with_entities(db.func.max(db.func.similarity(Genre.name, term))) \
+      .scalar_subquery()
+    rank = db.func.greatest(db.func.similarity(model.name, term) * NAME_WEIGHT,
+                            db.func.similarity(location(model), term) * LOCATION_WEIGHT,
+                            db.func.coalesce(genre_similarity, 0) * GENRES_WEIGHT)
+    
+    results = listing_query(model) \
+      .join(matches, matches.c.id == model.id) \
+      .add_columns(db.func.count().over().label('total')) \
+      .order_by(rank.desc(), model.name, model.id) \
+      .limit(limit) \
+      .all()
+    
+    return {'count': results[0].total if results else 0,
+            'data': results}
+
+
+# Trigrams of each word, padded the way pg_trgm pads them, used for ranking
+def word_trigrams(text):
+  trigrams = set()
+  for word in re.findall(r'\w+', text.lower()):
+    word = '  ' + word + ' '
+    trigrams.update(word[i:i + 3] for i in range(len(word) - 2))
+  return trigrams
+
+def similarity(a, b):
+  if not a or not b:
+    return 0.0
+  return len(a & b) / len(a | b)
+
+# In-memory trigram index over the searchable fields of one model. Substring
+# candidates are found by intersecting the postings of the term's trigrams.
+class TrigramIndex:
+  def __init__(self, rows, genres):
+    self.documents = {}
+    self.postings = {}
+    for row in rows:
+      fields = (row.name.lower(),
+                (row.city + ', ' + row.state).lower(),
+                ','.join(genres.get(row.id, ())).lower())
+      self.documents[row.id] = (row.name, fields, [word_trigrams(field) for field in fields])
+      for field in fields:
+        for i in range(len(field) - 2):
+          self.postings.setdefault(field[i:i + 3], set()).add(row.id)
+  
+  def search(self, term):
+    term = term.lower()
+    if len(term) < 3:
+      candidates = self.documents.keys()
+    else:
+      postings = [self.postings.get(term[i:i + 3], set()) for i in range(len(term) - 2)]
+      candidates = set.intersection(*postings)
+    
+    term_trigrams = word_trigrams(term)
+    matches = []
+    for id in candidates:
+      name, fields, trigrams = self.documents[id]
+      if not any(term in field for field in fields):
+        continue
+      rank = max(similarity(trigrams[0], term_trigrams) * NAME_WEIGHT,
+                 similarity(trigrams[1], term_trigrams) * LOCATION_WEIGHT,
+                 similarity(trigrams[2], term_trigrams) * GENRES_WEIGHT)
+      matches.append((-rank, name, id))
+    
+    matches.sort()
+    return [id for _, _, id in matches]
+
+# Changes whenever a row of the model is inserted, updated (which bumps its
+# version) or deleted, whichever process or statement wrote it
+def generation(model):
+  return tuple(db.session.query(db.func.count(model.id),
+                                db.func.max(model.id),
+                                db.func.coalesce(db.func.sum(model.version), 0)).one())
+
+# Fallback search for databases without pg_trgm. The index of each model is
+# built on first use, and built again once the model's generation changes.
+class MemorySearch:
+  def __init__(self):
+    self.indexes = {}
+    self.lock = threading.Lock()
+  
+  def get_index(self, model):
+    current = generation(model)
+    with self.lock:
+      built, index = self.indexes.get(model, (None, None))
+      if built != current:
+        # Shared by the next searches, so not held against this one's budget
+        with outside_budget():
+          association = model.genres.property.secondary
+          genres = {}
+          for id, name in db.session.query(association.c[model.__tablename__.lower() + '_id'], Genre.name) \
+              .join(Genre, Genre.id == association.c.genre_id):
+            genres.setdefault(id, []).append(name)
+          
+          rows = db.session.query(model.id, model.name, model.city, model.state)
+          index = TrigramIndex(rows, genres)
+        self.indexes[model] = (current, index)
+      return index
+  
+  def search(self, model, term, limit):
+    ids = self.get_index(model).search(term)
+    
+    rows = listing_query(model).filter(model.id.in_(ids[:limit])).all()
+    rows_by_id = {row.id: row for row in rows}
+    
+    return {'count': len(ids),
+            'data': [rows_by_id[id] for id in ids[:limit] if id in rows_by_id]}
+
+
+backends = {
+  'postgres': PostgresSearch(),
+  'memory': MemorySearch(),
+}
+
+def get_backend():
+  name = current_app.config.get('SEARCH_BACKEND')
+  if name is None:
+    name = 'postgres' if db.engine.dialect.name == 'postgresql' else 'memory'
+  return backends[name]
+
+# Search venues or artists, returning the number of matches and the best
+# ranked ones with their number of upcoming shows
+def search(model, term):
+  return get_backend().search(model, term.strip(), current_app.config['SEARCH_RESULTS_LIMIT'])
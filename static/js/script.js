@@ -2,3 +2,40 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Delete a venue or artist and go back home. Large ones are deleted by a
+// background job: its progress is polled from the Location of the 202.
+window.deleteEntity = function deleteEntity(url, button) {
+  button.disabled = true;
+  fetch(url, { method: "DELETE", headers: { Accept: "application/json" } })
+    .then((response) => {
+      if (response.status === 202) {
+        return pollJob(response.headers.get("Location"), button);
+      }
+      if (!response.ok) {
+        throw new Error("Delete failed with status " + response.status);
+      }
+      window.location = "/";
+    })
+    .catch((e) => {
+      console.error(e);
+      button.disabled = false;
+    });
+};
+
+window.pollJob = function pollJob(url, button) {
+  return fetch(url)
+    .then((response) => response.json())
+    .then((job) => {
+      if (job.status === "done") {
+        window.location = "/";
+      } else if (job.status === "failed") {
+        throw new Error(job.error);
+      } else {
+        if (job.total) {
+          button.textContent = "Deleting… " + Math.floor((100 * job.done) / job.total) + "%";
+        }
+        return new Promise((resolve) => setTimeout(resolve, 1000)).then(() => pollJob(url, button));
+      }
+    });
+};
@@ -0,0 +1,48 @@
+import uuid
+
+from flask import current_app, flash, jsonify, render_template, request, stream_template, url_for
+
+#----------------------------------------------------------------------------#
+# Controllers, one blueprint per resource.
+#----------------------------------------------------------------------------#
+
+# Status codes of the results of form writes and deletes
+WRITE_STATUS = {'created': 201, 'updated': 200, 'unchanged': 200, 'deleted': 200, 'queued': 202,
+                'conflict': 409, 'not_found': 404}
+
+# Render a listing page. With STREAM_TEMPLATES on, the page is sent while its
+# rows are still being fetched, so the client gets the first bytes right away.
+def render_listing(template_name, **context):
+  if current_app.config['STREAM_TEMPLATES']:
+    return current_app.response_class(stream_template(template_name, **context))
+  return render_template(template_name, **context)
+
+# Key of a create form, sent back with the post so that a retry does not
+# create the venue or artist twice
+def new_idempotency_key():
+  return uuid.uuid4().hex
+
+def wants_json():
+  return request.accept_mimetypes.best == 'application/json'
+
+# Answer a form write that clients want as JSON, or that failed: the form is
+# shown again with the errors of the result next to its fields
+def write_response(result, template_name, form, **context):
+  status = WRITE_STATUS[result['status']]
+  if wants_json():
+    return jsonify(result), status
+  for field, errors in result.get('errors', {}).items():
+    if field in form:
+      form[field].errors = list(form[field].errors) + errors
+    for error in errors:
+      flash(error)
+  return render_template(template_name, form=form, idempotency_key=new_idempotency_key(), **context), status
+
+# Answer a delete. A queued one points to its job, which clients poll until
+# it is done.
+def delete_response(result):
+  response = jsonify(result)
+  response.status_code = WRITE_STATUS[result['status']]
+  if result['status'] == 'queued':
+    response.headers['Location'] = url_for('jobs.job', job_id=result['job_id'])
+  return response
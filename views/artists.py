@@ -0,0 +1,150 @@
+import database
+
+from cache import cache
+from datetime import datetime
+from flask import Blueprint, abort, current_app, flash, redirect, render_template, request, url_for
+from models import Artist, db, filter_by_genre
+from pagination import Page
+from search import search
+from views import delete_response, new_idempotency_key, render_listing, wants_json, write_response
+
+blueprint = Blueprint('artists', __name__)
+
+#  Artists
+#  ----------------------------------------------------------------
+@blueprint.route('/artists')
+@database.read_only
+@cache.cached('artists')
+def artists():
+  artists = db.session.query(Artist.id, Artist.name)
+  genre = request.args.get('genre')
+  if genre:
+    artists = filter_by_genre(artists, Artist, genre)
+  
+  page = Page(artists,
+              (Artist.name, Artist.id),
+              cursor=request.args.get('after'),
+              limit=current_app.config['LISTING_PAGE_SIZE'])
+  
+  return render_listing('pages/artists.html', artists=page, page=page)
+
+@blueprint.route('/artists/search', methods=['POST'])
+@database.read_only
+def search_artists():
+  search_term = request.form.get('search_term', '')
+  
+  response = search(Artist, search_term)
+  
+  return render_template('pages/search_artists.html', results=response, search_term=search_term)
+
+@blueprint.route('/artists/<int:artist_id>')
+@database.read_only
+@cache.cached('artist:{artist_id}', ttl='CACHE_DETAIL_TTL')
+def show_artist(artist_id):
+  today = datetime.today()
+  
+  data = Artist.query.options(db.selectinload(Artist.genres)).get(artist_id)
+  if data is None:
+    abort(404)
+  shows = data.get_shows(today, limit=current_app.config['SHOWS_PER_PAGE'])
+  cache.expire_at(shows.pop('next_show_time'))
+  
+  # The page shows the names and images of these venues
+  cache.tag(*{'venue:%d' % show.venue_id for show in shows['past_shows'] + shows['upcoming_shows']})
+  
+  return render_template('pages/show_artist.html', artist=data, **shows)
+
+#  Delete
+#  ----------------------------------------------------------------
+
+@blueprint.route('/artists/<int:artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+  from writes import delete
+  try:
+    result = delete(Artist, artist_id)
+  except:
+    db.session.rollback()
+    current_app.logger.exception('%s %s failed', request.method, request.path)
+    abort(500)
+  finally:
+    db.session.close()
+  return delete_response(result)
+
+#  Update
+#  ----------------------------------------------------------------
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  from forms import ArtistForm
+  form = ArtistForm()
+  artist = Artist.query.get(artist_id)
+  return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  from forms import ArtistForm
+  from writes import form_values, update_entity
+  form = ArtistForm(request.form, meta={'csrf': False})
+  if form.validate():
+    try:
+      result = update_entity(db.session.connection(), Artist, artist_id, form_values(Artist, form), form.genres.data)
+      db.session.commit()
+    except:
+      db.session.rollback()
+      current_app.logger.exception('%s %s failed', request.method, request.path)
+      flash('An error occurred. Artist ' + request.form['name'] + ' could not be updated.')
+      return render_template('pages/home.html')
+    finally:
+      db.session.close()
+    
+    if result['status'] == 'updated':
+      cache.invalidate('artists', 'artist:%d' % artist_id, 'shows')
+    if result['status'] not in ('updated', 'unchanged') or wants_json():
+      return write_response(result, 'forms/edit_artist.html', form, artist={'id': artist_id, 'name': request.form['name']})
+    return redirect(url_for('artists.show_artist', artist_id=artist_id))
+  else:
+    message = []
+    for _, err in form.errors.items():
+        message.append(' '.join(err))
+    flash('Errors ' + str(message) + '. Artist could not be updated.')
+  
+  return render_template('pages/home.html')
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@blueprint.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  from forms import ArtistForm
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form, idempotency_key=new_idempotency_key())
+
+@blueprint.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  from forms import ArtistForm
+  from writes import create_entity, form_values, idempotency_key, run_idempotent
+  form = ArtistForm(request.form, meta={'csrf': False})
+  if form.validate():
+    try:
+      result = run_idempotent(idempotency_key(), lambda connection: create_entity(
+        connection, Artist, form_values(Artist, form), form.genres.data))
+      db.session.commit()
+    except:
+      db.session.rollback()
+      current_app.logger.exception('%s %s failed', request.method, request.path)
+      flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
+      return render_template('pages/home.html')
+    finally:
+      db.session.close()
+    
+    if result['status'] == 'created' and not result.get('replayed'):
+      cache.invalidate('artists')
+    if result['status'] != 'created' or wants_json():
+      return write_response(result, 'forms/new_artist.html', form)
+    flash('Artist ' + request.form['name'] + ' was successfully listed!')
+  else:
+    message = []
+    for _, err in form.errors.items():
+        message.append(' '.join(err))
+    flash('Errors ' + str(message) + '. Artist could not be listed.')
+  
+  return render_template('pages/home.html')
@@ -0,0 +1,25 @@
+from datetime import datetime
+from flask import Blueprint, abort, current_app, jsonify, request
+
+blueprint = Blueprint('jobs', __name__)
+
+#  Jobs
+#  ----------------------------------------------------------------
+
+def serialize_job(job):
+  return {field: value.isoformat() if isinstance(value, datetime) else value for field, value in job.items()}
+
+@blueprint.route('/jobs')
+def jobs():
+  from jobs import list_jobs
+  jobs = list_jobs(request.args.get('status'), request.args.get('kind'),
+                   min(request.args.get('limit', 50, type=int), current_app.config['API_MAX_PAGE_SIZE']))
+  return jsonify({'data': [serialize_job(job) for job in jobs]})
+
+@blueprint.route('/jobs/<int:job_id>')
+def job(job_id):
+  from jobs import get_job
+  job = get_job(job_id)
+  if job is None:
+    abort(404)
+  return jsonify(serialize_job(job))
@@ -0,0 +1,60 @@
+import database
+
+from cache import cache
+from datetime import datetime
+from flask import Blueprint, Response, abort, current_app, jsonify, render_template, request, stream_with_context
+from models import db
+
+blueprint = Blueprint('pages', __name__)
+
+@blueprint.route('/')
+def index():
+  return render_template('pages/home.html')
+
+#  Export
+#  ----------------------------------------------------------------
+
+def parse_date(value):
+  if not value:
+    return None
+  try:
+    return datetime.fromisoformat(value)
+  except ValueError:
+    abort(400)
+
+@blueprint.route('/export/<any(venues, artists, shows):kind>.<any(csv, jsonl):format>')
+@database.read_only
+def export_catalog(kind, format):
+  from exporter import export, gzip_chunks
+  chunks = export(kind, format, parse_date(request.args.get('start')), parse_date(request.args.get('end')))
+  headers = {}
+  if 'gzip' in request.accept_encodings:
+    chunks = gzip_chunks(chunks)
+    headers['Content-Encoding'] = 'gzip'
+  mimetype = 'text/csv' if format == 'csv' else 'application/x-ndjson'
+  return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+#  Cache
+#  ----------------------------------------------------------------
+
+@blueprint.route('/cache/stats')
+def cache_stats():
+  return jsonify(cache.stats())
+
+#  Database
+#  ----------------------------------------------------------------
+
+@blueprint.route('/db/stats')
+def database_stats():
+  stats = database.pool_stats(db.engine)
+  if 'replicas' in current_app.extensions:
+    stats['replicas'] = current_app.extensions['replicas'].stats()
+  return jsonify(stats)
+
+@blueprint.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+@blueprint.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500
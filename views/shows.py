@@ -0,0 +1,46 @@
+import database
+
+from cache import cache
+from flask import Blueprint, current_app, flash, render_template, request
+from models import Show, ShowCard
+from pagination import Page
+from views import render_listing
+
+blueprint = Blueprint('shows', __name__)
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@blueprint.route('/shows')
+@database.read_only
+@cache.cached('shows')
+def shows():
+  page = Page(Show.get_listing(),
+              (Show.start_time, Show.id),
+              cursor=request.args.get('after'),
+              limit=current_app.config['LISTING_PAGE_SIZE'])
+  
+  return render_listing('pages/shows.html', shows=map(ShowCard, page), page=page)
+
+@blueprint.route('/shows/create')
+def create_shows():
+  from forms import ShowForm
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@blueprint.route('/shows/create', methods=['POST'])
+def create_show_submission():
+  from scheduling import schedule_shows
+  try:
+    result, = schedule_shows([request.form.to_dict()])
+    if result['status'] == 'created':
+      cache.invalidate('venues', 'artists', 'shows', 'venue:%d' % result['venue_id'], 'artist:%d' % result['artist_id'])
+      flash('Show was successfully listed!')
+    elif result['status'] == 'conflict':
+      flash('Show could not be listed. The venue or the artist already has a show at that time.')
+    else:
+      flash('Show could not be listed. Check the venue, the artist and the start time.')
+  except:
+    current_app.logger.exception('%s %s failed', request.method, request.path)
+    flash('An error occurred. Show could not be listed.')
+  return render_template('pages/home.html')
@@ -0,0 +1,152 @@
+import database
+
+from cache import cache
+from datetime import datetime
+from flask import Blueprint, abort, current_app, flash, redirect, render_template, request, url_for
+from models import Venue, db, filter_by_genre
+from pagination import Page
+from search import search
+from views import delete_response, new_idempotency_key, render_listing, wants_json, write_response
+
+blueprint = Blueprint('venues', __name__)
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@blueprint.route('/venues')
+@database.read_only
+@cache.cached('venues')
+def venues():
+  venues = Venue.get_listing()
+  genre = request.args.get('genre')
+  if genre:
+    venues = filter_by_genre(venues, Venue, genre)
+  
+  page = Page(venues,
+              (Venue.city, Venue.state, Venue.name, Venue.id),
+              cursor=request.args.get('after'),
+              limit=current_app.config['LISTING_PAGE_SIZE'])
+  
+  return render_listing('pages/venues.html', areas=Venue.get_areas(page), page=page)
+
+@blueprint.route('/venues/search', methods=['POST'])
+@database.read_only
+def search_venues():
+  search_term = request.form.get('search_term', '')
+  
+  response = search(Venue, search_term)
+  
+  return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+@blueprint.route('/venues/<int:venue_id>')
+@database.read_only
+@cache.cached('venue:{venue_id}', ttl='CACHE_DETAIL_TTL')
+def show_venue(venue_id):
+  today = datetime.today()
+  
+  data = Venue.query.options(db.selectinload(Venue.genres)).get(venue_id)
+  if data is None:
+    abort(404)
+  shows = data.get_shows(today, limit=current_app.config['SHOWS_PER_PAGE'])
+  cache.expire_at(shows.pop('next_show_time'))
+  
+  # The page shows the names and images of these artists
+  cache.tag(*{'artist:%d' % show.artist_id for show in shows['past_shows'] + shows['upcoming_shows']})
+  
+  return render_template('pages/show_venue.html', venue=data, **shows)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@blueprint.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  from forms import VenueForm
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form, idempotency_key=new_idempotency_key())
+
+@blueprint.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  from forms import VenueForm
+  from writes import create_entity, form_values, idempotency_key, run_idempotent
+  form = VenueForm(request.form, meta={'csrf': False})
+  if form.validate():
+    try:
+      result = run_idempotent(idempotency_key(), lambda connection: create_entity(
+        connection, Venue, form_values(Venue, form), form.genres.data))
+      db.session.commit()
+    except:
+      db.session.rollback()
+      current_app.logger.exception('%s %s failed', request.method, request.path)
+      flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.')
+      return render_template('pages/home.html')
+    finally:
+      db.session.close()
+    
+    if result['status'] == 'created' and not result.get('replayed'):
+      cache.invalidate('venues')
+    if result['status'] != 'created' or wants_json():
+      return write_response(result, 'forms/new_venue.html', form)
+    flash('Venue ' + request.form['name'] + ' was successfully listed!')
+  else:
+    message = []
+    for _, err in form.errors.items():
+        message.append(' '.join(err))
+    flash('Errors ' + str(message) + '. Venue could not be listed.')
+  
+  return render_template('pages/home.html')
+
+#  Delete
+#  ----------------------------------------------------------------
+
+@blueprint.route('/venues/<int:venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  from writes import delete
+  try:
+    result = delete(Venue, venue_id)
+  except:
+    db.session.rollback()
+    current_app.logger.exception('%s %s failed', request.method, request.path)
+    abort(500)
+  finally:
+    db.session.close()
+  return delete_response(result)
+
+#  Update
+#  ----------------------------------------------------------------
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  from forms import VenueForm
+  form = VenueForm()
+  venue = Venue.query.get(venue_id)
+  return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  from forms import VenueForm
+  from writes import form_values, update_entity
+  form = VenueForm(request.form, meta={'csrf': False})
+  if form.validate():
+    try:
+      result = update_entity(db.session.connection(), Venue, venue_id, form_values(Venue, form), form.genres.data)
+      db.session.commit()
+    except:
+      db.session.rollback()
+      current_app.logger.exception('%s %s failed', request.method, request.path)
+      flash('An error occurred. Venue ' + request.form['name'] + ' could not be updated.')
+      return render_template('pages/home.html')
+    finally:
+      db.session.close()
+    
+    if result['status'] == 'updated':
+      cache.invalidate('venues', 'venue:%d' % venue_id, 'shows')
+    if result['status'] not in ('updated', 'unchanged') or wants_json():
+      return write_response(result, 'forms/edit_venue.html', form, venue={'id': venue_id, 'name': request.form['name']})
+    return redirect(url_for('venues.show_venue', venue_id=venue_id))
+  else:
+    message = []
+    for _, err in form.errors.items():
+        message.append(' '.join(err))
+    flash('Errors ' + str(message) + '. Venue could not be updated.')
+  
+  return render_template('pages/home.html')
@@ -0,0 +1,242 @@
+from cache import cache
+from database import insert_statement
+from datetime import datetime, timedelta
+from flask import current_app, request
+from importer import COLUMNS, GENRES
+from models import Artist, Genre, IdempotencyKey, Show, Venue, db, refresh_show_counters, show_key
+
+#----------------------------------------------------------------------------#
+# Form writes.
+#
+# Venues and artists are created with one INSERT ... ON CONFLICT DO NOTHING
+# on their (name, city, state) key, and edited with one UPDATE that only
+# matches the row when a submitted column IS DISTINCT FROM its stored value
+# and no other row holds the new key. Neither reads the row first; the
+# follow-up query that tells a conflict from a missing or unchanged row only
+# runs when nothing was written.
+#
+# Results are dicts with a status (created, updated, unchanged, conflict or
+# not_found), the id of the venue or artist, and the errors by field.
+#----------------------------------------------------------------------------#
+
+KEY = ('name', 'city', 'state')
+
+# Column values of a validated venue or artist form, genres excepted
+def form_values(model, form):
+  data = {COLUMNS.get(field, field): value for field, value in form.data.items()}
+  return {column: data[column] for column in model.__table__.columns.keys() if column in data}
+
+def find_id(connection, model, values):
+  table = model.__table__
+  return connection.execute(
+    db.select([table.c.id]).where(db.and_(*[table.c[column] == values[column] for column in KEY]))).scalar()
+
+def conflict(model, values, id):
+  kind = model.__tablename__.lower()
+  return {'status': 'conflict', 'id': id,
+          'errors': {'name': ['A %s named %s already exists in %s, %s' % (kind, values['name'], values['city'], values['state'])]}}
+
+def not_found(model, id):
+  return {'status': 'not_found', 'id': id, 'errors': {'id': ['No %s with id %d' % (model.__tablename__.lower(), id)]}}
+
+# Make the genres of a venue or artist the given ones. Returns whether any
+# link was added or removed.
+def set_genres(connection, model, id, names):
+  genres = Genre.__table__
+  association = GENRES[model]
+  key = association.c[model.__tablename__.lower() + '_id']
+  if names:
+    connection.execute(insert_statement(connection, genres).on_conflict_do_nothing(index_elements=['name']),
+                       [{'name': name} for name in names])
+  wanted = db.select([genres.c.id]).where(genres.c.name.in_(names))
+  
+  removed = connection.execute(association.delete()
+                               .where(key == id)
+                               .where(association.c.genre_id.notin_(wanted))).rowcount
+  added = connection.execute(insert_statement(connection, association)
+                             .from_select([key.name, 'genre_id'],
+                                          db.select([db.literal(id), genres.c.id]).where(genres.c.name.in_(names)))
+                             .on_conflict_do_nothing()).rowcount
+  return bool(removed or added)
+
+def create_entity(connection, model, values, genres):
+  table = model.__table__
+  statement = insert_statement(connection, table).values(**values).on_conflict_do_nothing(index_elements=list(KEY))
+  if connection.dialect.implicit_returning:
+    id = connection.execute(statement.returning(table.c.id)).scalar()
+  else:
+    result = connection.execute(statement)
+    id = result.inserted_primary_key[0] if result.rowcount else None
+  if id is None:
+    return conflict(model, values, find_id(connection, model, values))
+  
+  set_genres(connection, model, id, genres)
+  return {'status': 'created', 'id': id}
+
+def update_entity(connection, model, id, values, genres):
+  table = model.__table__
+  statement = table.update() \
+    .where(table.c.id == id) \
+    .where(db.or_(*[table.c[column].is_distinct_from(value) for column, value in values.items()])) \
+    .values(**values)
+  if all(column in values for column in KEY):
+    other = table.alias()
+    statement = statement.where(~db.exists().where(db.and_(
+      other.c.id != id, *[other.c[column] == values[column] for column in KEY])))
+  
+  if connection.dialect.implicit_returning:
+    updated = connection.execute(statement.returning(table.c.id)).scalar() is not None
+  else:
+    updated = connection.execute(statement).rowcount > 0
+  if not updated:
+    # The row itself, and the one holding its new key if any
+    condition = table.c.id == id
+    if all(column in values for column in KEY):
+      condition = db.or_(condition, db.and_(*[table.c[column] == values[column] for column in KEY]))
+    ids = {row_id for row_id, in connection.execute(db.select([table.c.id]).where(condition))}
+    if id not in ids:
+      return not_found(model, id)
+    if len(ids) > 1:
+      return conflict(model, values, (ids - {id}).pop())
+  
+  if set_genres(connection, model, id, genres):
+    # The API derives its ETags from the version, which genres are part of
+    if not updated:
+      connection.execute(table.update().where(table.c.id == id).values(version=table.c.version + 1))
+    updated = True
+  return {'status': 'updated' if updated else 'unchanged', 'id': id}
+
+#----------------------------------------------------------------------------#
+# Deletes.
+#
+# The shows and genre links of a venue or artist go with it through ON DELETE
+# CASCADE, so deleting one is a single statement whatever its history; the
+# counters of the artists it had shows with (or venues, for an artist) are
+# then recomputed. Venues and artists with more than DELETE_INLINE_MAX_SHOWS
+# shows are deleted by a background job instead, DELETE_BATCH_SIZE shows per
+# transaction, so that no transaction locks a whole history at once.
+#
+# Results are dicts with a status (deleted, queued or not_found), the id and,
+# when queued, the id of the job.
+#----------------------------------------------------------------------------#
+
+MODELS = {'venue': Venue, 'artist': Artist}
+
+# Venues for an artist, artists for a venue
+def other_side(model):
+  return Artist if model is Venue else Venue
+
+def show_partners(connection, model, id):
+  other = show_key(other_side(model))
+  return [other_id for other_id, in connection.execute(db.select([other]).where(show_key(model) == id).distinct())]
+
+# Delete a venue or artist and refresh the counters of the other side of its
+# shows, or of `other_ids` when its shows are already gone. Returns those
+# ids, or None when there was no such row.
+def delete_entity(connection, model, id, other_ids=None):
+  if other_ids is None:
+    other_ids = show_partners(connection, model, id)
+  table = model.__table__
+  if not connection.execute(table.delete().where(table.c.id == id)).rowcount:
+    return None
+  if other_ids:
+    refresh_show_counters(connection, other_side(model), other_ids)
+  return other_ids
+
+# Pages showing a deleted venue or artist, or its counters
+def deleted_tags(model, id, other_ids):
+  kind, other = model.__tablename__.lower(), other_side(model).__tablename__.lower()
+  return ['venues', 'artists', 'shows', '%s:%d' % (kind, id), *['%s:%d' % (other, other_id) for other_id in other_ids]]
+
+# Job deleting a venue or artist with a long history, reporting the number of
+# shows deleted so far. Each batch refreshes the counters of the other side of
+# its shows, so that a job stopped halfway leaves none out of date.
+def delete_in_batches(kind, id, report):
+  model = MODELS[kind]
+  other = other_side(model)
+  shows = Show.__table__
+  key, other_key = shows.c[kind + '_id'], shows.c[other.__tablename__.lower() + '_id']
+  with db.engine.begin() as connection:
+    total = connection.execute(db.select([db.func.count()]).where(key == id)).scalar()
+  
+  done = 0
+  other_ids = set()
+  report(done, total)
+  batch = db.select([shows.c.id, other_key]).where(key == id).limit(current_app.config['DELETE_BATCH_SIZE'])
+  while True:
+    with db.engine.begin() as connection:
+      rows = connection.execute(batch).fetchall()
+      if not rows:
+        break
+      connection.execute(shows.delete().where(shows.c.id.in_([row[0] for row in rows])))
+      refresh_show_counters(connection, other, {row[1] for row in rows})
+    other_ids.update(row[1] for row in rows)
+    done += len(rows)
+    report(done, total)
+  
+  with db.engine.begin() as connection:
+    deleted = delete_entity(connection, model, id, other_ids=[])
+  cache.invalidate(*deleted_tags(model, id, other_ids))
+  if deleted is None:
+    return not_found(model, id)
+  return {'status': 'deleted', 'id': id, 'shows': done}
+
+# Delete a venue or artist in the session's transaction, or queue the job
+# deleting it when its history is too long for a request
+def delete(model, id):
+  from jobs import enqueue
+  table = model.__table__
+  shows = db.session.execute(db.select([table.c.upcoming_shows_count + table.c.past_shows_count])
+                             .where(table.c.id == id)).scalar()
+  if shows is None:
+    return not_found(model, id)
+  if shows > current_app.config['DELETE_INLINE_MAX_SHOWS']:
+    kind = model.__tablename__.lower()
+    return {'status': 'queued', 'id': id, 'job_id': enqueue('delete', {'kind': kind, 'id': id}, key='delete:%s:%d' % (kind, id))}
+  
+  other_ids = delete_entity(db.session.connection(), model, id)
+  if other_ids is None:
+    return not_found(model, id)
+  db.session.commit()
+  cache.invalidate(*deleted_tags(model, id, other_ids))
+  return {'status': 'deleted', 'id': id}
+
+#----------------------------------------------------------------------------#
+# Idempotency keys.
+#
+# Create forms carry a random key, also accepted as an Idempotency-Key
+# header. The first post with a key claims it with an INSERT ... ON CONFLICT
+# DO NOTHING and records its result in the same transaction; a retry of that
+# post finds the key taken and returns the recorded result. On Postgres, a
+# retry racing the first post waits on the key's row until that commits.
+#----------------------------------------------------------------------------#
+
+def idempotency_key():
+  key = request.headers.get('Idempotency-Key') or request.form.get('idempotency_key')
+  return key[:64] if key else None
+
+# Run write(connection) once per key, in the session's transaction. Replayed
+# results are marked as such.
+def run_idempotent(key, write):
+  connection = db.session.connection()
+  if not key:
+    return write(connection)
+  
+  keys = IdempotencyKey.__table__
+  claimed = connection.execute(insert_statement(connection, keys)
+                               .values(key=key, created_at=datetime.utcnow())
+                               .on_conflict_do_nothing(index_elements=['key'])).rowcount
+  if not claimed:
+    result = connection.execute(db.select([keys.c.result]).where(keys.c.key == key)).scalar()
+    if result is not None:
+      return dict(result, replayed=True)
+  
+  result = write(connection)
+  connection.execute(keys.update().where(keys.c.key == key).values(result=result))
+  return result
+
+# Delete the keys older than IDEMPOTENCY_KEY_TTL seconds
+def purge_idempotency_keys(connection):
+  before = datetime.utcnow() - timedelta(seconds=current_app.config['IDEMPOTENCY_KEY_TTL'])
+  keys = IdempotencyKey.__table__
+  return connection.execute(keys.delete().where(keys.c.created_at < before)).rowcount